@@ -0,0 +1,95 @@
+"""
+Event-loop lag benchmark for the preferences API
+
+Runs a ticker that should wake every TICK seconds and records how late each
+wake-up is, first idle, then while a writer hammers the store through the
+blocking functions, then through the async `prefs` API.
+
+Usage:
+    python -m benchmarks.loop_lag [--backend sqlite|json] [--writes N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+TICK = 0.005
+
+
+def _setup_env(backend: str, directory: str) -> None:
+    """Point the store at throwaway files before user_prefs is imported"""
+    os.environ["PREFS_BACKEND"] = backend
+    os.environ["PREFS_FILE"] = os.path.join(directory, "user_prefs.json")
+    os.environ["PREFS_DB_FILE"] = os.path.join(directory, "user_prefs.db")
+
+
+async def _ticker(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def _sync_writer(user_prefs, writes: int) -> None:
+    for i in range(writes):
+        user_prefs.add_favorite(i % 1000, "movies", i, f"Movie {i}")
+        user_prefs.add_subscription(i % 1000, "drama")
+        if i % 100 == 0:
+            user_prefs.flush()
+        if i % 10 == 0:
+            await asyncio.sleep(0)
+
+
+async def _async_writer(user_prefs, writes: int) -> None:
+    prefs = user_prefs.prefs
+    for i in range(writes):
+        await prefs.add_favorite(i % 1000, "movies", i, f"Movie {i}")
+        await prefs.add_subscription(i % 1000, "drama")
+        if i % 100 == 0:
+            await prefs.flush()
+
+
+async def _measure(writer) -> list:
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    if writer is None:
+        await asyncio.sleep(1)
+    else:
+        await writer
+    stop.set()
+    await ticker
+    return lags
+
+
+def _report(name: str, lags: list) -> None:
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{name:<12} ticks={len(lags_ms):<6} "
+        f"p50={statistics.median(lags_ms):7.2f}ms p99={p99:7.2f}ms max={lags_ms[-1]:7.2f}ms"
+    )
+
+
+async def main(backend: str, writes: int) -> None:
+    import user_prefs
+
+    _report("idle", await _measure(None))
+    _report("sync", await _measure(_sync_writer(user_prefs, writes)))
+    _report("async", await _measure(_async_writer(user_prefs, writes)))
+    user_prefs.prefs.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "json"])
+    parser.add_argument("--writes", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup_env(args.backend, tmp)
+        print(f"backend={args.backend} writes={args.writes} tick={TICK * 1000:.0f}ms")
+        asyncio.run(main(args.backend, args.writes))
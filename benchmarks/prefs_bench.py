@@ -0,0 +1,233 @@
+"""
+Storage benchmark for the user_prefs API at large user populations
+
+Generates synthetic users with skewed favorites and subscription counts,
+loads them into each backend, then times every public user_prefs function
+and reports p50/p99 latency and throughput as JSON.
+
+Usage:
+    python -m benchmarks.prefs_bench [--users 10000,100000] [--backends json,sqlite,kv]
+                                     [--ops 2000] [--output results.json]
+
+Each (backend, population) pair runs in a fresh subprocess configured through
+the same PREFS_* environment variables as the bot. The kv backend uses the
+in-process fake server unless PREFS_REDIS_URL points at a real one.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+# Share of users per language, roughly matching a European-heavy audience
+LANGUAGE_WEIGHTS = {
+    "en": 40, "fr": 12, "es": 10, "de": 8, "it": 5, "pt": 5, "ru": 5, "ar": 3,
+    "tr": 3, "pl": 2, "nl": 2, "hi": 2, "ja": 1, "ko": 1, "zh": 1,
+}
+
+# Relative popularity of subscription topics
+TOPIC_WEIGHTS = {
+    "new_movies": 30, "trending": 25, "new_series": 20, "action": 10, "comedy": 8,
+    "drama": 7, "scifi": 6, "horror": 4, "romance": 3, "animation": 3,
+}
+
+SEED = 42
+
+
+def generate_users(count: int, seed: int = SEED) -> Dict[str, Dict]:
+    """Synthetic users in the user_prefs.json layout.
+
+    Favorites follow a Pareto distribution (most users save a handful, a few
+    power users save thousands) and half of the users have no subscriptions.
+    """
+    rng = random.Random(seed)
+    languages = list(LANGUAGE_WEIGHTS)
+    language_weights = list(LANGUAGE_WEIGHTS.values())
+    topics = list(TOPIC_WEIGHTS)
+    topic_weights = list(TOPIC_WEIGHTS.values())
+    added_at = datetime(2024, 1, 1).isoformat()
+
+    users = {}
+    for user_id in range(1, count + 1):
+        favorites = {"movies": [], "series": []}
+        for media_type in favorites:
+            n = min(int(rng.paretovariate(1.2)) - 1, 5000)
+            for item_id in rng.sample(range(1, 1_000_000), n):
+                favorites[media_type].append({
+                    "id": item_id, "title": f"Title {item_id}", "poster_path": None, "added_at": added_at
+                })
+
+        subscriptions = []
+        if rng.random() < 0.5:
+            for _ in range(rng.randint(1, 4)):
+                topic = rng.choices(topics, topic_weights)[0]
+                if topic not in subscriptions:
+                    subscriptions.append(topic)
+
+        users[str(user_id)] = {
+            "language": rng.choices(languages, language_weights)[0],
+            "favorites": favorites,
+            "subscriptions": subscriptions,
+        }
+    return users
+
+
+def populate(backend: str, users: Dict[str, Dict]) -> None:
+    """Write the synthetic users where the configured backend will find them"""
+    if backend == "json":
+        with open(os.environ["PREFS_FILE"], "w", encoding="utf-8") as f:
+            json.dump(users, f)
+        return
+
+    import user_prefs
+    if backend == "sqlite":
+        user_prefs._store.import_users(users)
+        return
+
+    for user_key, user_data in users.items():
+        changes = [("set_language", user_data["language"])]
+        for media_type, items in user_data["favorites"].items():
+            changes.extend(("add_favorite", media_type, fav["id"], fav["title"], None) for fav in items)
+        changes.extend(("add_subscription", topic) for topic in user_data["subscriptions"])
+        user_prefs.apply_changes(int(user_key), changes)
+
+
+def _time(func: Callable, args_list: List[tuple]) -> Dict:
+    latencies = []
+    started = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        result = func(*args)
+        if hasattr(result, "__next__"):
+            for _ in result:
+                pass
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "ops": len(latencies),
+        "p50_us": round(statistics.median(latencies) * 1e6, 2),
+        "p99_us": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 2),
+        "throughput_ops_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def run_worker(backend: str, population: int, ops: int) -> List[Dict]:
+    """Populate one backend and time every public user_prefs function"""
+    users = generate_users(population)
+    t0 = time.perf_counter()
+    populate(backend, users)
+    del users
+
+    import user_prefs
+    load_seconds = time.perf_counter() - t0
+
+    rng = random.Random(SEED + 1)
+    uid = lambda: rng.randint(1, population)
+    item = lambda: rng.randint(1, 1_000_000)
+    topic = lambda: rng.choice(list(TOPIC_WEIGHTS))
+    bulk_ops = max(1, ops // 100)
+
+    cases = {
+        "get_user_language": [(uid(),) for _ in range(ops)],
+        "set_user_language": [(uid(), rng.choice(list(LANGUAGE_WEIGHTS))) for _ in range(ops)],
+        "get_favorites": [(uid(), "movies") for _ in range(ops)],
+        "add_favorite": [(uid(), "movies", item(), "Bench", None) for _ in range(ops)],
+        "is_favorite": [(uid(), "movies", item()) for _ in range(ops)],
+        "remove_favorite": [(uid(), "movies", item()) for _ in range(ops)],
+        "get_subscriptions": [(uid(),) for _ in range(ops)],
+        "add_subscription": [(uid(), topic()) for _ in range(ops)],
+        "is_subscribed": [(uid(), topic()) for _ in range(ops)],
+        "remove_subscription": [(uid(), topic()) for _ in range(ops)],
+        "apply_changes": [(uid(), [("set_language", "fr"), ("add_subscription", topic())]) for _ in range(ops)],
+        "get_all_subscribers": [(topic(),) for _ in range(bulk_ops)],
+        "iter_subscribers": [(topic(), 1000) for _ in range(bulk_ops)],
+        "flush": [() for _ in range(bulk_ops)],
+        # A full snapshot rewrite on the json backend, so only a few rounds
+        "compact": [() for _ in range(min(bulk_ops, 5))],
+    }
+
+    results = []
+    for name, args_list in cases.items():
+        results.append({
+            "backend": backend,
+            "users": population,
+            "function": name,
+            **_time(getattr(user_prefs, name), args_list),
+        })
+    results.append({"backend": backend, "users": population, "function": "startup_load", "seconds": round(load_seconds, 3)})
+    user_prefs.close()
+    return results
+
+
+def run_suite(backends: List[str], populations: List[int], ops: int) -> Dict:
+    """Run every (backend, population) pair in its own subprocess"""
+    results = []
+    for population in populations:
+        for backend in backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ)
+                env.update({
+                    "PREFS_BACKEND": backend,
+                    "PREFS_FILE": os.path.join(tmp, "user_prefs.json"),
+                    "PREFS_DB_FILE": os.path.join(tmp, "user_prefs.db"),
+                })
+                env.setdefault("PREFS_REDIS_URL", "memory://")
+                print(f"⏱️  {backend} @ {population} users", file=sys.stderr)
+                proc = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.prefs_bench", "--worker",
+                     "--backends", backend, "--users", str(population), "--ops", str(ops)],
+                    env=env, capture_output=True, text=True
+                )
+                if proc.returncode != 0:
+                    print(proc.stderr, file=sys.stderr)
+                    results.append({"backend": backend, "users": population, "error": proc.stderr.strip().splitlines()[-1:]})
+                    continue
+                results.extend(json.loads(proc.stdout))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ops": ops,
+            "seed": SEED,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="10000,100000,1000000", help="comma separated population sizes")
+    parser.add_argument("--backends", default="json,sqlite,kv", help="comma separated backend names")
+    parser.add_argument("--ops", type=int, default=2000, help="calls per point-lookup function")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    backends = args.backends.split(",")
+    populations = [int(n) for n in args.users.split(",")]
+
+    if args.worker:
+        json.dump(run_worker(backends[0], populations[0], args.ops), sys.stdout)
+        return
+
+    report = json.dumps(run_suite(backends, populations, args.ops), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Memory benchmark for cached TMDB list pages: raw JSON dicts vs tmdb_models
+
+Builds synthetic pages with every field TMDB returns for list endpoints,
+parses them the way the client does and reports the memory one cached page
+takes in each form, measured with tracemalloc. With --languages N the same
+titles are cached in N languages, once with every language holding its own
+copy of the language-neutral fields and once sharing them via TitleRegistry.
+
+Usage:
+    python -m benchmarks.tmdb_models_bench [--pages 200] [--media-type movie] [--languages 15]
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+from tmdb_models import Page, TitleRegistry
+
+SEED = 42
+
+# Words for generated titles and overviews
+WORDS = (
+    "the last night city dark love story return world war house secret king "
+    "girl man shadow road fire heart blood dream life time summer winter"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _date(rng: random.Random) -> str:
+    return f"{rng.randint(1970, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def generate_item(rng: random.Random, media_type: str) -> Dict[str, Any]:
+    """One list result with the fields TMDB sends for movies or series"""
+    title = _text(rng, rng.randint(1, 5))
+    item = {
+        "adult": False,
+        "backdrop_path": f"/{rng.getrandbits(64):x}.jpg",
+        "genre_ids": rng.sample(range(10, 10800), rng.randint(1, 4)),
+        "id": rng.randint(1, 1_500_000),
+        "original_language": rng.choice(["en", "fr", "es", "ja", "ko"]),
+        "overview": _text(rng, rng.randint(20, 120)),
+        "popularity": round(rng.uniform(1, 5000), 3),
+        "poster_path": f"/{rng.getrandbits(64):x}.jpg",
+        "vote_average": round(rng.uniform(0, 10), 3),
+        "vote_count": rng.randint(0, 30000),
+    }
+    if media_type == "movie":
+        item.update({
+            "original_title": title,
+            "release_date": _date(rng),
+            "title": title,
+            "video": False,
+        })
+    else:
+        item.update({
+            "first_air_date": _date(rng),
+            "name": title,
+            "origin_country": [rng.choice(["US", "GB", "FR", "JP", "KR"])],
+            "original_name": title,
+        })
+    return item
+
+
+def generate_page(rng: random.Random, page: int, media_type: str) -> Dict[str, Any]:
+    return {
+        "page": page,
+        "results": [generate_item(rng, media_type) for _ in range(20)],
+        "total_pages": 500,
+        "total_results": 10000,
+    }
+
+
+def translate(rng: random.Random, page: Dict[str, Any]) -> Dict[str, Any]:
+    """The same page in another language: new title and overview, same facts"""
+    results = []
+    for item in page["results"]:
+        item = dict(item)
+        title = _text(rng, rng.randint(1, 5))
+        item["title" if "title" in item else "name"] = title
+        item["overview"] = _text(rng, rng.randint(20, 120))
+        results.append(item)
+    return {**page, "results": results}
+
+
+def measure(build: Callable[[], List[Any]]) -> int:
+    """Bytes still allocated by what `build` returns"""
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main(pages: int, media_type: str, languages: int) -> None:
+    rng = random.Random(SEED)
+    originals = [generate_page(rng, page, media_type) for page in range(1, pages + 1)]
+    # Kept as JSON text so every form is built from scratch inside measure()
+    bodies = [json.dumps(page) for page in originals]
+    bodies += [json.dumps(translate(rng, page)) for _ in range(languages - 1) for page in originals]
+    parse = partial(Page.from_tmdb, media_type=media_type)
+
+    def shared() -> List[Any]:
+        titles = TitleRegistry()
+        return [titles, [titles.share(parse(json.loads(body))) for body in bodies]]
+
+    results = {
+        "raw dict": measure(lambda: [json.loads(body) for body in bodies]),
+        "models": measure(lambda: [parse(json.loads(body)) for body in bodies]),
+    }
+    if languages > 1:
+        results["shared"] = measure(shared)
+
+    cached = len(bodies)
+    print(f"pages={pages} languages={languages} media_type={media_type} results/page=20")
+    for name, size in results.items():
+        reduction = (1 - size / results["raw dict"]) * 100
+        print(f"{name:<10} {size / cached:10.0f} bytes/page  {reduction:5.1f}% smaller than raw")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--media-type", default="movie", choices=["movie", "tv"])
+    parser.add_argument("--languages", type=int, default=1)
+    args = parser.parse_args()
+    main(args.pages, args.media_type, args.languages)
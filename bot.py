@@ -16,6 +16,9 @@ from aiogram.client.default import DefaultBotProperties
 
 from config import BOT_TOKEN
 from tmdb_client import tmdb
+from translations import SUPPORTED_LANGUAGES, get_tmdb_language
+import user_prefs
+from middlewares.user_context import UserContextMiddleware
 
 # Import handlers
 from handlers import start, movies, series, trending, search, language, favorites, subscriptions
@@ -38,7 +41,9 @@ def home():
 
 @app.route('/health')
 def health():
-    return {"status": "healthy", "bot": "running"}, 200
+    # Still 200 while TMDB is down: the bot keeps serving cached data
+    status = "healthy" if tmdb.breaker.state == "closed" else "degraded"
+    return {"status": status, "bot": "running", "tmdb": tmdb.stats()}, 200
 
 def run_flask():
     """Run Flask server in background thread"""
@@ -47,9 +52,16 @@ def run_flask():
 
 # ============ Bot Setup ============
 
+background_tasks = []
+
+
 async def on_startup():
     """Startup actions"""
     logger.info("🚀 Bot is starting...")
+    background_tasks.append(asyncio.create_task(user_prefs.run_flusher()))
+    tmdb_languages = [get_tmdb_language(code) for code in SUPPORTED_LANGUAGES]
+    background_tasks.append(asyncio.create_task(tmdb.run_cache_warmer(tmdb_languages)))
+    background_tasks.append(asyncio.create_task(tmdb.run_changes_poller()))
     logger.info("📡 Connected to TMDB API")
     logger.info("🌍 Multi-language support enabled")
     logger.info("⭐ Favorites system active")
@@ -59,6 +71,12 @@ async def on_startup():
 async def on_shutdown():
     """Shutdown actions"""
     logger.info("🛑 Bot is shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await user_prefs.prefs.flush()
+    user_prefs.prefs.close()
     await tmdb.close()
     logger.info("✅ Cleanup complete")
 
@@ -85,6 +103,10 @@ async def main():
     # Initialize dispatcher
     dp = Dispatcher()
     
+    # Load user preferences once per update
+    dp.message.outer_middleware(UserContextMiddleware())
+    dp.callback_query.outer_middleware(UserContextMiddleware())
+    
     # Register routers (order matters!)
     dp.include_router(start.router)
     dp.include_router(language.router)
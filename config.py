@@ -25,3 +25,65 @@ TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
 
 # Items per page
 ITEMS_PER_PAGE = 5
+
+# User preferences storage: "sqlite" (default), "json" (legacy single file)
+# or "kv" (Redis-protocol server). "json" is limited to a single bot process.
+# An empty SQLite database is filled from PREFS_FILE on startup if that file exists
+PREFS_BACKEND = os.getenv("PREFS_BACKEND", "sqlite")
+PREFS_FILE = os.getenv("PREFS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_prefs.json"))
+PREFS_DB_FILE = os.getenv("PREFS_DB_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_prefs.db"))
+# Seconds between background syncs of the preferences journal (json backend)
+PREFS_FLUSH_INTERVAL = float(os.getenv("PREFS_FLUSH_INTERVAL", "5"))
+# Journal size (bytes) after which it is compacted into a new user_prefs.json snapshot
+PREFS_JOURNAL_MAX_BYTES = int(os.getenv("PREFS_JOURNAL_MAX_BYTES", str(1024 * 1024)))
+# How long (ms) a SQLite writer waits for another process holding the write lock
+PREFS_DB_BUSY_TIMEOUT_MS = int(os.getenv("PREFS_DB_BUSY_TIMEOUT_MS", "5000"))
+# Key-value backend: server URL ("memory://" runs an in-process fake) and key prefix
+PREFS_REDIS_URL = os.getenv("PREFS_REDIS_URL", "redis://localhost:6379/0")
+PREFS_REDIS_PREFIX = os.getenv("PREFS_REDIS_PREFIX", "prefs:")
+
+# Seconds between polls of TMDB's /movie/changes and /tv/changes feeds, which expire the
+# cached details of edited titles (0 disables polling; details then keep a short TTL)
+TMDB_CHANGES_INTERVAL = float(os.getenv("TMDB_CHANGES_INTERVAL", "300"))
+# TMDB response cache: max entries kept in memory and TTL (seconds) per kind of endpoint
+TMDB_CACHE_MAX_ENTRIES = int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "5000"))
+TMDB_CACHE_LIST_TTL = int(os.getenv("TMDB_CACHE_LIST_TTL", "600"))
+TMDB_CACHE_DETAILS_TTL = int(os.getenv(
+    "TMDB_CACHE_DETAILS_TTL", str(3 * 24 * 3600 if TMDB_CHANGES_INTERVAL > 0 else 6 * 3600)
+))
+TMDB_CACHE_SEARCH_TTL = int(os.getenv("TMDB_CACHE_SEARCH_TTL", "300"))
+# On-disk second cache tier that survives restarts ("" disables it) and its size limit in bytes
+TMDB_CACHE_DB_FILE = os.getenv("TMDB_CACHE_DB_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tmdb_cache.db"))
+TMDB_CACHE_DB_MAX_BYTES = int(os.getenv("TMDB_CACHE_DB_MAX_BYTES", str(64 * 1024 * 1024)))
+# Client-side TMDB rate limit: sustained requests per second and burst size
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_BURST = int(os.getenv("TMDB_RATE_BURST", "20"))
+# How often a request rejected with 429 is retried, and the longest Retry-After (seconds) honored
+TMDB_429_RETRIES = int(os.getenv("TMDB_429_RETRIES", "3"))
+TMDB_RETRY_AFTER_MAX = float(os.getenv("TMDB_RETRY_AFTER_MAX", "30"))
+# TMDB request timeouts (seconds) and retries with exponential backoff for failed GETs
+TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "5"))
+TMDB_READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", "10"))
+TMDB_TOTAL_TIMEOUT = float(os.getenv("TMDB_TOTAL_TIMEOUT", "20"))
+TMDB_RETRIES = int(os.getenv("TMDB_RETRIES", "2"))
+TMDB_RETRY_BACKOFF = float(os.getenv("TMDB_RETRY_BACKOFF", "0.5"))
+# Circuit breaker: consecutive failed requests before TMDB is skipped, and seconds before trying again
+TMDB_BREAKER_THRESHOLD = int(os.getenv("TMDB_BREAKER_THRESHOLD", "5"))
+TMDB_BREAKER_RESET = float(os.getenv("TMDB_BREAKER_RESET", "30"))
+# TMDB connection pool: total and per-host connection limits, DNS cache TTL and
+# how long (seconds) idle keep-alive connections stay open for reuse
+TMDB_POOL_LIMIT = int(os.getenv("TMDB_POOL_LIMIT", "100"))
+TMDB_POOL_LIMIT_PER_HOST = int(os.getenv("TMDB_POOL_LIMIT_PER_HOST", "30"))
+TMDB_DNS_CACHE_TTL = int(os.getenv("TMDB_DNS_CACHE_TTL", "300"))
+TMDB_KEEPALIVE_TIMEOUT = float(os.getenv("TMDB_KEEPALIVE_TIMEOUT", "30"))
+# Background prefetches of the next list page allowed at once (0 disables prefetching)
+TMDB_PREFETCH_CONCURRENCY = int(os.getenv("TMDB_PREFETCH_CONCURRENCY", "4"))
+# Cache warmer: list pages refreshed in every language (0 disables it), seconds between
+# refresh cycles (keep below TMDB_CACHE_LIST_TTL) and between two warm requests
+TMDB_WARM_PAGES = int(os.getenv("TMDB_WARM_PAGES", "2"))
+TMDB_WARM_INTERVAL = float(os.getenv("TMDB_WARM_INTERVAL", str(TMDB_CACHE_LIST_TTL * 0.75)))
+TMDB_WARM_SPACING = float(os.getenv("TMDB_WARM_SPACING", "0.5"))
+# Requests one get_many_details() call keeps in flight at once
+TMDB_BULK_CONCURRENCY = int(os.getenv("TMDB_BULK_CONCURRENCY", "8"))
+# Language fetched alongside the user's to fill empty titles and overviews ("" disables it)
+TMDB_FALLBACK_LANGUAGE = os.getenv("TMDB_FALLBACK_LANGUAGE", "en-US")
@@ -8,9 +8,8 @@ from aiogram.filters import Command
 
 from tmdb_client import tmdb
 from translations import get_text, get_tmdb_language
-from user_prefs import (
-    get_user_language, get_favorites, add_favorite, remove_favorite, is_favorite
-)
+from keyboards.inline import mark_favorite_saved
+from middlewares.user_context import UserContext
 
 router = Router()
 
@@ -71,9 +70,9 @@ def get_favorites_list_keyboard(favorites: list, media_type: str, page: int, lan
 
 
 @router.message(Command("favorites"))
-async def cmd_favorites(message: Message):
+async def cmd_favorites(message: Message, user_ctx: UserContext):
     """Handle /favorites command"""
-    user_lang = get_user_language(message.from_user.id)
+    user_lang = user_ctx.language
     
     text = f"⭐ <b>{get_text(user_lang, 'favorites')}</b>\n\n{get_text(user_lang, 'fav_description')}"
     
@@ -85,9 +84,9 @@ async def cmd_favorites(message: Message):
 
 
 @router.callback_query(F.data == "favorites")
-async def callback_favorites(callback: CallbackQuery):
+async def callback_favorites(callback: CallbackQuery, user_ctx: UserContext):
     """Handle favorites menu button"""
-    user_lang = get_user_language(callback.from_user.id)
+    user_lang = user_ctx.language
     
     text = f"⭐ <b>{get_text(user_lang, 'favorites')}</b>\n\n{get_text(user_lang, 'fav_description')}"
     
@@ -108,13 +107,12 @@ async def callback_favorites(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("fav_list:"))
-async def callback_favorites_list(callback: CallbackQuery):
+async def callback_favorites_list(callback: CallbackQuery, user_ctx: UserContext):
     """Show favorites list"""
     media_type = callback.data.split(":")[1]
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
+    user_lang = user_ctx.language
     
-    favorites = get_favorites(user_id, media_type)
+    favorites = await user_ctx.get_favorites(media_type)
     
     if not favorites:
         emoji = "🎬" if media_type == "movies" else "📺"
@@ -137,15 +135,14 @@ async def callback_favorites_list(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("fav_page:"))
-async def callback_favorites_page(callback: CallbackQuery):
+async def callback_favorites_page(callback: CallbackQuery, user_ctx: UserContext):
     """Handle favorites pagination"""
     parts = callback.data.split(":")
     media_type = parts[1]
     page = int(parts[2])
     
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
-    favorites = get_favorites(user_id, media_type)
+    user_lang = user_ctx.language
+    favorites = await user_ctx.get_favorites(media_type)
     
     emoji = "🎬" if media_type == "movies" else "📺"
     text = f"{emoji} <b>{get_text(user_lang, 'fav_' + media_type)}</b>\n\n{get_text(user_lang, 'fav_count').format(count=len(favorites))}"
@@ -159,47 +156,59 @@ async def callback_favorites_page(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("fav_add:"))
-async def callback_add_favorite(callback: CallbackQuery):
+async def callback_add_favorite(callback: CallbackQuery, user_ctx: UserContext):
     """Add item to favorites"""
     parts = callback.data.split(":")
     media_type = parts[1]
     item_id = int(parts[2])
     
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
+    user_lang = user_ctx.language
     tmdb_lang = get_tmdb_language(user_lang)
     
     # Get item details
     if media_type == "movies":
-        item = await tmdb.get_movie_details(item_id, language=tmdb_lang)
-        title = item.get("title", "Unknown")
+        item = await tmdb.get_movie_full(item_id, language=tmdb_lang)
     else:
-        item = await tmdb.get_series_details(item_id, language=tmdb_lang)
-        title = item.get("name", "Unknown")
+        item = await tmdb.get_series_full(item_id, language=tmdb_lang)
     
-    poster_path = item.get("poster_path")
+    title = item.title or "Unknown"
+    poster_path = item.poster_path
     
-    if add_favorite(user_id, media_type, item_id, title, poster_path):
+    if await user_ctx.add_favorite(media_type, item_id, title, poster_path):
+        if not await user_ctx.commit():
+            await callback.answer("❌ Error", show_alert=True)
+            return
         await callback.answer(f"⭐ {get_text(user_lang, 'fav_added')}", show_alert=True)
+        
+        # Turn the card's add button into the saved badge
+        if callback.message and callback.message.reply_markup:
+            try:
+                await callback.message.edit_reply_markup(
+                    reply_markup=mark_favorite_saved(callback.message.reply_markup, user_lang)
+                )
+            except Exception:
+                pass
     else:
         await callback.answer(f"ℹ️ {get_text(user_lang, 'fav_already')}", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("fav_remove:"))
-async def callback_remove_favorite(callback: CallbackQuery):
+async def callback_remove_favorite(callback: CallbackQuery, user_ctx: UserContext):
     """Remove item from favorites"""
     parts = callback.data.split(":")
     media_type = parts[1]
     item_id = int(parts[2])
     
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
+    user_lang = user_ctx.language
     
-    if remove_favorite(user_id, media_type, item_id):
+    if await user_ctx.remove_favorite(media_type, item_id):
+        if not await user_ctx.commit():
+            await callback.answer("❌ Error", show_alert=True)
+            return
         await callback.answer(f"🗑️ {get_text(user_lang, 'fav_removed')}", show_alert=True)
         
         # Refresh the list
-        favorites = get_favorites(user_id, media_type)
+        favorites = await user_ctx.get_favorites(media_type)
         
         if not favorites:
             emoji = "🎬" if media_type == "movies" else "📺"
@@ -222,25 +231,24 @@ async def callback_remove_favorite(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("fav_view:"))
-async def callback_view_favorite(callback: CallbackQuery):
+async def callback_view_favorite(callback: CallbackQuery, user_ctx: UserContext):
     """View favorite item details"""
     parts = callback.data.split(":")
     media_type = parts[1]
     item_id = int(parts[2])
     
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
+    user_lang = user_ctx.language
     tmdb_lang = get_tmdb_language(user_lang)
     
     # Get item details
     if media_type == "movies":
-        item = await tmdb.get_movie_details(item_id, language=tmdb_lang)
-        title = item.get("title", "Unknown")
-        rating = item.get("vote_average", 0)
-        date = item.get("release_date", "N/A")
-        runtime = item.get("runtime", 0)
-        genres = ", ".join([g["name"] for g in item.get("genres", [])[:3]])
-        overview = item.get("overview", "No description available.")
+        item = await tmdb.get_movie_full(item_id, language=tmdb_lang)
+        title = item.title or "Unknown"
+        rating = item.rating
+        date = item.date.isoformat() if item.date else "N/A"
+        runtime = item.runtime
+        genres = ", ".join(item.genres[:3])
+        overview = item.overview or "No description available."
         
         text = (
             f"🎬 <b>{title}</b>\n\n"
@@ -251,14 +259,14 @@ async def callback_view_favorite(callback: CallbackQuery):
             f"{get_text(user_lang, 'overview')}\n{overview}"
         )
     else:
-        item = await tmdb.get_series_details(item_id, language=tmdb_lang)
-        title = item.get("name", "Unknown")
-        rating = item.get("vote_average", 0)
-        date = item.get("first_air_date", "N/A")
-        seasons = item.get("number_of_seasons", 0)
-        episodes = item.get("number_of_episodes", 0)
-        genres = ", ".join([g["name"] for g in item.get("genres", [])[:3]])
-        overview = item.get("overview", "No description available.")
+        item = await tmdb.get_series_full(item_id, language=tmdb_lang)
+        title = item.title or "Unknown"
+        rating = item.rating
+        date = item.date.isoformat() if item.date else "N/A"
+        seasons = item.seasons
+        episodes = item.episodes
+        genres = ", ".join(item.genres[:3])
+        overview = item.overview or "No description available."
         
         text = (
             f"📺 <b>{title}</b>\n\n"
@@ -7,7 +7,7 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 from aiogram.filters import Command
 
 from translations import SUPPORTED_LANGUAGES, get_text
-from user_prefs import get_user_language, set_user_language
+from middlewares.user_context import UserContext
 from keyboards.inline import get_main_menu_localized
 
 router = Router()
@@ -34,9 +34,9 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
 
 
 @router.message(Command("language"))
-async def cmd_language(message: Message):
+async def cmd_language(message: Message, user_ctx: UserContext):
     """Handle /language command"""
-    user_lang = get_user_language(message.from_user.id)
+    user_lang = user_ctx.language
     text = get_text(user_lang, "select_language")
     
     await message.answer(
@@ -47,9 +47,9 @@ async def cmd_language(message: Message):
 
 
 @router.callback_query(F.data == "language")
-async def callback_language(callback: CallbackQuery):
+async def callback_language(callback: CallbackQuery, user_ctx: UserContext):
     """Handle language button from menu"""
-    user_lang = get_user_language(callback.from_user.id)
+    user_lang = user_ctx.language
     text = get_text(user_lang, "select_language")
     
     try:
@@ -69,13 +69,15 @@ async def callback_language(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("set_lang:"))
-async def callback_set_language(callback: CallbackQuery):
+async def callback_set_language(callback: CallbackQuery, user_ctx: UserContext):
     """Handle language selection"""
     lang_code = callback.data.split(":")[1]
-    user_id = callback.from_user.id
     
     # Save preference
-    set_user_language(user_id, lang_code)
+    user_ctx.set_language(lang_code)
+    if not await user_ctx.commit():
+        await callback.answer("❌ Error", show_alert=True)
+        return
     
     # Get confirmation message in new language
     lang_name = SUPPORTED_LANGUAGES[lang_code]["name"]
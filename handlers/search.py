@@ -48,18 +48,16 @@ async def callback_search(callback: CallbackQuery):
 async def show_search_results(message: Message, query: str, page: int = 1, edit: bool = False):
     """Show search results"""
     data = await tmdb.search_multi(query=query, page=page)
-    results = data.get("results", [])
-    total_pages = min(data.get("total_pages", 1), 50)
-    
-    # Filter to only movies and TV shows
-    results = [r for r in results if r.get("media_type") in ["movie", "tv"]]
+    # People are already left out of the results
+    results = data.results
+    total_pages = min(data.total_pages, 50)
     
     if not results:
         text = f"🔍 <b>Search:</b> {query}\n\n❌ No results found."
         keyboard = get_back_keyboard()
     else:
         item = results[0]
-        media_type = item.get("media_type", "movie")
+        media_type = item.media_type
         
         if media_type == "movie":
             formatted = tmdb.format_movie(item)
@@ -73,7 +71,7 @@ async def show_search_results(message: Message, query: str, page: int = 1, edit:
             page=page,
             total_pages=total_pages,
             query=query,
-            item_id=item.get("id"),
+            item_id=item.id,
             media_type=media_type
         )
     
@@ -109,38 +107,33 @@ async def inline_search(inline_query: InlineQuery):
     
     # Search TMDB
     data = await tmdb.search_multi(query=query, page=1)
-    search_results = data.get("results", [])[:10]  # Limit to 10 results
-    
-    # Filter to only movies and TV shows
-    search_results = [r for r in search_results if r.get("media_type") in ["movie", "tv"]]
+    search_results = data.results[:10]  # Limit to 10 results
     
     results = []
     for item in search_results:
-        media_type = item.get("media_type", "movie")
+        media_type = item.media_type
         
         if media_type == "movie":
-            title = item.get("title", "Unknown")
-            year = item.get("release_date", "")[:4] if item.get("release_date") else ""
             emoji = "🎬"
             formatted = tmdb.format_movie(item)
         else:
-            title = item.get("name", "Unknown")
-            year = item.get("first_air_date", "")[:4] if item.get("first_air_date") else ""
             emoji = "📺"
             formatted = tmdb.format_series(item)
         
-        rating = item.get("vote_average", 0)
-        overview = item.get("overview", "No description")[:100]
+        title = item.title or "Unknown"
+        year = item.date.year if item.date else ""
+        rating = item.rating
+        overview = (item.overview or "No description")[:100]
         
         # Create unique ID
-        result_id = md5(f"{media_type}_{item.get('id')}".encode()).hexdigest()
+        result_id = md5(f"{media_type}_{item.id}".encode()).hexdigest()
         
         results.append(
             InlineQueryResultArticle(
                 id=result_id,
                 title=f"{emoji} {title} ({year})",
                 description=f"⭐ {rating:.1f} | {overview}...",
-                thumbnail_url=tmdb.get_poster_url(item.get("poster_path")),
+                thumbnail_url=tmdb.get_poster_url(item.poster_path),
                 input_message_content=InputTextMessageContent(
                     message_text=formatted,
                     parse_mode="HTML"
@@ -2,6 +2,8 @@
 Series Handler - Display latest and popular TV series - Localized
 """
 
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
@@ -9,85 +11,72 @@ from aiogram.filters import Command
 from tmdb_client import tmdb
 from keyboards.inline import get_series_keyboard, get_popular_series_keyboard, get_back_keyboard
 from translations import get_text, get_tmdb_language
-from user_prefs import get_user_language
+from middlewares.user_context import UserContext
 
 router = Router()
 
 
 @router.message(Command("series"))
-async def cmd_series(message: Message):
+async def cmd_series(message: Message, user_ctx: UserContext):
     """Handle /series command"""
-    user_lang = get_user_language(message.from_user.id)
-    await show_series(message, page=1, lang=user_lang)
+    user_lang = user_ctx.language
+    await show_series(message, page=1, lang=user_lang, user_ctx=user_ctx)
 
 
 @router.callback_query(F.data.startswith("series:"))
-async def callback_series(callback: CallbackQuery):
+async def callback_series(callback: CallbackQuery, user_ctx: UserContext):
     """Handle series pagination"""
     page = int(callback.data.split(":")[1])
-    user_lang = get_user_language(callback.from_user.id)
-    await show_series(callback.message, page=page, edit=True, lang=user_lang)
+    user_lang = user_ctx.language
+    await show_series(callback.message, page=page, edit=True, lang=user_lang, user_ctx=user_ctx)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("popular_series:"))
-async def callback_popular_series(callback: CallbackQuery):
+async def callback_popular_series(callback: CallbackQuery, user_ctx: UserContext):
     """Handle popular series pagination"""
     page = int(callback.data.split(":")[1])
-    user_lang = get_user_language(callback.from_user.id)
-    await show_popular_series(callback.message, page=page, edit=True, lang=user_lang)
+    user_lang = user_ctx.language
+    await show_popular_series(callback.message, page=page, edit=True, lang=user_lang, user_ctx=user_ctx)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("details_series:"))
-async def callback_series_details(callback: CallbackQuery):
+async def callback_series_details(callback: CallbackQuery, user_ctx: UserContext):
     """Handle series details"""
     series_id = int(callback.data.split(":")[1])
-    user_lang = get_user_language(callback.from_user.id)
+    user_lang = user_ctx.language
     await show_series_details(callback.message, series_id, edit=True, lang=user_lang)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("trailer_series:"))
-async def callback_series_trailer(callback: CallbackQuery):
+async def callback_series_trailer(callback: CallbackQuery, user_ctx: UserContext):
     """Handle series trailer request"""
     series_id = int(callback.data.split(":")[1])
-    user_lang = get_user_language(callback.from_user.id)
+    user_lang = user_ctx.language
     tmdb_lang = get_tmdb_language(user_lang)
     
-    videos = await tmdb.get_series_videos(series_id, language=tmdb_lang)
-    results = videos.get("results", [])
-    
-    # Find YouTube trailer
-    trailer = None
-    for video in results:
-        if video.get("site") == "YouTube" and video.get("type") in ["Trailer", "Teaser"]:
-            trailer = video
-            break
-    
-    # If no trailer in user language, try English
-    if not trailer:
-        videos = await tmdb.get_series_videos(series_id, language="en-US")
-        results = videos.get("results", [])
-        for video in results:
-            if video.get("site") == "YouTube" and video.get("type") in ["Trailer", "Teaser"]:
-                trailer = video
-                break
+    # Same cached request as the details view: details + videos in one round trip
+    item = await tmdb.get_series_full(series_id, language=tmdb_lang)
+    trailer = tmdb.find_trailer(item, tmdb_lang, types=("Trailer", "Teaser"))
     
     if trailer:
-        youtube_url = f"https://www.youtube.com/watch?v={trailer['key']}"
+        youtube_url = f"https://www.youtube.com/watch?v={trailer.key}"
         await callback.answer(get_text(user_lang, "opening_trailer"), show_alert=False)
         await callback.message.answer(f"📺 <b>Trailer</b>\n\n{youtube_url}", parse_mode="HTML")
     else:
         await callback.answer(get_text(user_lang, "no_trailer"), show_alert=True)
 
 
-async def show_series(message: Message, page: int = 1, edit: bool = False, lang: str = "en"):
+async def show_series(message: Message, page: int = 1, edit: bool = False, lang: str = "en", user_ctx: Optional[UserContext] = None):
     """Show latest series (airing today)"""
     tmdb_lang = get_tmdb_language(lang)
     data = await tmdb.get_latest_series(page=page, language=tmdb_lang)
-    results = data.get("results", [])
-    total_pages = min(data.get("total_pages", 1), 50)  # Cap at 50 pages
+    results = data.results
+    total_pages = min(data.total_pages, 50)  # Cap at 50 pages
+    if page < total_pages:
+        tmdb.prefetch(tmdb.get_latest_series, page=page + 1, language=tmdb_lang)
     
     if not results:
         text = get_text(lang, "no_series")
@@ -98,14 +87,15 @@ async def show_series(message: Message, page: int = 1, edit: bool = False, lang:
         keyboard = get_series_keyboard(
             page=page,
             total_pages=total_pages,
-            series_id=series.get("id"),
+            series_id=series.id,
             has_trailer=True,
-            lang=lang
+            lang=lang,
+            is_saved=await user_ctx.is_favorite("series", series.id) if user_ctx else None
         )
     
     if edit:
         try:
-            poster_url = tmdb.get_poster_url(results[0].get("poster_path")) if results else None
+            poster_url = tmdb.get_poster_url(results[0].poster_path) if results else None
             if poster_url:
                 await message.delete()
                 await message.answer_photo(
@@ -123,7 +113,7 @@ async def show_series(message: Message, page: int = 1, edit: bool = False, lang:
                 pass
             await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
     else:
-        poster_url = tmdb.get_poster_url(results[0].get("poster_path")) if results else None
+        poster_url = tmdb.get_poster_url(results[0].poster_path) if results else None
         if poster_url:
             await message.answer_photo(
                 photo=poster_url,
@@ -135,12 +125,14 @@ async def show_series(message: Message, page: int = 1, edit: bool = False, lang:
             await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
-async def show_popular_series(message: Message, page: int = 1, edit: bool = False, lang: str = "en"):
+async def show_popular_series(message: Message, page: int = 1, edit: bool = False, lang: str = "en", user_ctx: Optional[UserContext] = None):
     """Show popular TV series"""
     tmdb_lang = get_tmdb_language(lang)
     data = await tmdb.get_popular_series(page=page, language=tmdb_lang)
-    results = data.get("results", [])
-    total_pages = min(data.get("total_pages", 1), 50)
+    results = data.results
+    total_pages = min(data.total_pages, 50)
+    if page < total_pages:
+        tmdb.prefetch(tmdb.get_popular_series, page=page + 1, language=tmdb_lang)
     
     if not results:
         text = get_text(lang, "no_series")
@@ -151,13 +143,14 @@ async def show_popular_series(message: Message, page: int = 1, edit: bool = Fals
         keyboard = get_popular_series_keyboard(
             page=page,
             total_pages=total_pages,
-            series_id=series.get("id"),
-            lang=lang
+            series_id=series.id,
+            lang=lang,
+            is_saved=await user_ctx.is_favorite("series", series.id) if user_ctx else None
         )
     
     if edit:
         try:
-            poster_url = tmdb.get_poster_url(results[0].get("poster_path")) if results else None
+            poster_url = tmdb.get_poster_url(results[0].poster_path) if results else None
             if poster_url:
                 await message.delete()
                 await message.answer_photo(
@@ -175,7 +168,7 @@ async def show_popular_series(message: Message, page: int = 1, edit: bool = Fals
                 pass
             await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
     else:
-        poster_url = tmdb.get_poster_url(results[0].get("poster_path")) if results else None
+        poster_url = tmdb.get_poster_url(results[0].poster_path) if results else None
         if poster_url:
             await message.answer_photo(
                 photo=poster_url,
@@ -190,20 +183,20 @@ async def show_popular_series(message: Message, page: int = 1, edit: bool = Fals
 async def show_series_details(message: Message, series_id: int, edit: bool = False, lang: str = "en"):
     """Show detailed series information"""
     tmdb_lang = get_tmdb_language(lang)
-    series = await tmdb.get_series_details(series_id, language=tmdb_lang)
+    series = await tmdb.get_series_full(series_id, language=tmdb_lang)
     
-    if "error" in series or not series.get("name"):
+    if series.error or not series.title:
         text = get_text(lang, "no_series")
         keyboard = get_back_keyboard(lang)
     else:
-        title = series.get("name", "Unknown")
-        rating = series.get("vote_average", 0)
-        first_air = series.get("first_air_date", "N/A")
-        seasons = series.get("number_of_seasons", 0)
-        episodes = series.get("number_of_episodes", 0)
-        status = series.get("status", "Unknown")
-        genres = ", ".join([g["name"] for g in series.get("genres", [])[:3]])
-        overview = series.get("overview", "No description available.")
+        title = series.title
+        rating = series.rating
+        first_air = series.date.isoformat() if series.date else "N/A"
+        seasons = series.seasons
+        episodes = series.episodes
+        status = series.status or "Unknown"
+        genres = ", ".join(series.genres[:3])
+        overview = series.overview or "No description available."
         
         text = (
             f"📺 <b>{title}</b>\n\n"
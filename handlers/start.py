@@ -8,15 +8,15 @@ from aiogram.filters import CommandStart, Command
 
 from keyboards.inline import get_main_menu_localized
 from translations import get_text
-from user_prefs import get_user_language
+from middlewares.user_context import UserContext
 
 router = Router()
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, user_ctx: UserContext):
     """Handle /start command"""
-    user_lang = get_user_language(message.from_user.id)
+    user_lang = user_ctx.language
     welcome = get_text(user_lang, "welcome")
     
     await message.answer(
@@ -27,9 +27,9 @@ async def cmd_start(message: Message):
 
 
 @router.message(Command("help"))
-async def cmd_help(message: Message):
+async def cmd_help(message: Message, user_ctx: UserContext):
     """Handle /help command"""
-    user_lang = get_user_language(message.from_user.id)
+    user_lang = user_ctx.language
     welcome = get_text(user_lang, "welcome")
     
     await message.answer(
@@ -40,9 +40,9 @@ async def cmd_help(message: Message):
 
 
 @router.callback_query(F.data == "main_menu")
-async def callback_main_menu(callback: CallbackQuery):
+async def callback_main_menu(callback: CallbackQuery, user_ctx: UserContext):
     """Handle main menu button"""
-    user_lang = get_user_language(callback.from_user.id)
+    user_lang = user_ctx.language
     welcome = get_text(user_lang, "welcome")
     
     try:
@@ -2,23 +2,22 @@
 Subscriptions Handler - Manage user subscription topics
 """
 
+from typing import List
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 
 from translations import get_text
-from user_prefs import (
-    get_user_language, get_subscriptions, add_subscription, 
-    remove_subscription, is_subscribed, SUBSCRIPTION_TOPICS
-)
+from user_prefs import SUBSCRIPTION_TOPICS
+from middlewares.user_context import UserContext
 
 router = Router()
 
 
-def get_subscriptions_keyboard(user_id: int, lang: str = "en") -> InlineKeyboardMarkup:
+def get_subscriptions_keyboard(user_subs: List[str], lang: str = "en") -> InlineKeyboardMarkup:
     """Subscriptions menu keyboard showing all topics with toggle"""
     buttons = []
-    user_subs = get_subscriptions(user_id)
     
     # Group topics in rows of 2
     topics = list(SUBSCRIPTION_TOPICS.items())
@@ -48,10 +47,9 @@ def get_subscriptions_keyboard(user_id: int, lang: str = "en") -> InlineKeyboard
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def get_my_subscriptions_keyboard(user_id: int, lang: str = "en") -> InlineKeyboardMarkup:
+def get_my_subscriptions_keyboard(user_subs: List[str], lang: str = "en") -> InlineKeyboardMarkup:
     """Keyboard showing user's active subscriptions"""
     buttons = []
-    user_subs = get_subscriptions(user_id)
     
     if user_subs:
         for topic_key in user_subs:
@@ -79,10 +77,10 @@ def get_my_subscriptions_keyboard(user_id: int, lang: str = "en") -> InlineKeybo
 
 
 @router.message(Command("subscriptions"))
-async def cmd_subscriptions(message: Message):
+async def cmd_subscriptions(message: Message, user_ctx: UserContext):
     """Handle /subscriptions command"""
-    user_lang = get_user_language(message.from_user.id)
-    user_subs = get_subscriptions(message.from_user.id)
+    user_lang = user_ctx.language
+    user_subs = await user_ctx.get_subscriptions()
     
     text = (
         f"🔔 <b>{get_text(user_lang, 'subscriptions')}</b>\n\n"
@@ -92,16 +90,16 @@ async def cmd_subscriptions(message: Message):
     
     await message.answer(
         text,
-        reply_markup=get_subscriptions_keyboard(message.from_user.id, user_lang),
+        reply_markup=get_subscriptions_keyboard(user_subs, user_lang),
         parse_mode="HTML"
     )
 
 
 @router.callback_query(F.data == "subscriptions")
-async def callback_subscriptions(callback: CallbackQuery):
+async def callback_subscriptions(callback: CallbackQuery, user_ctx: UserContext):
     """Handle subscriptions menu button"""
-    user_lang = get_user_language(callback.from_user.id)
-    user_subs = get_subscriptions(callback.from_user.id)
+    user_lang = user_ctx.language
+    user_subs = await user_ctx.get_subscriptions()
     
     text = (
         f"🔔 <b>{get_text(user_lang, 'subscriptions')}</b>\n\n"
@@ -112,35 +110,38 @@ async def callback_subscriptions(callback: CallbackQuery):
     try:
         await callback.message.edit_text(
             text,
-            reply_markup=get_subscriptions_keyboard(callback.from_user.id, user_lang),
+            reply_markup=get_subscriptions_keyboard(user_subs, user_lang),
             parse_mode="HTML"
         )
     except Exception:
         await callback.message.delete()
         await callback.message.answer(
             text,
-            reply_markup=get_subscriptions_keyboard(callback.from_user.id, user_lang),
+            reply_markup=get_subscriptions_keyboard(user_subs, user_lang),
             parse_mode="HTML"
         )
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("sub_toggle:"))
-async def callback_toggle_subscription(callback: CallbackQuery):
+async def callback_toggle_subscription(callback: CallbackQuery, user_ctx: UserContext):
     """Toggle subscription on/off"""
     topic = callback.data.split(":")[1]
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
+    user_lang = user_ctx.language
     
-    if is_subscribed(user_id, topic):
-        remove_subscription(user_id, topic)
-        await callback.answer(f"🔕 {get_text(user_lang, 'unsubscribed')}", show_alert=False)
+    if await user_ctx.is_subscribed(topic):
+        await user_ctx.remove_subscription(topic)
+        notice = f"🔕 {get_text(user_lang, 'unsubscribed')}"
     else:
-        add_subscription(user_id, topic)
-        await callback.answer(f"🔔 {get_text(user_lang, 'subscribed')}", show_alert=False)
+        await user_ctx.add_subscription(topic)
+        notice = f"🔔 {get_text(user_lang, 'subscribed')}"
+    if not await user_ctx.commit():
+        await callback.answer("❌ Error", show_alert=True)
+        return
+    await callback.answer(notice, show_alert=False)
     
     # Refresh the menu
-    user_subs = get_subscriptions(user_id)
+    user_subs = await user_ctx.get_subscriptions()
     text = (
         f"🔔 <b>{get_text(user_lang, 'subscriptions')}</b>\n\n"
         f"{get_text(user_lang, 'sub_description')}\n\n"
@@ -150,7 +151,7 @@ async def callback_toggle_subscription(callback: CallbackQuery):
     try:
         await callback.message.edit_text(
             text,
-            reply_markup=get_subscriptions_keyboard(user_id, user_lang),
+            reply_markup=get_subscriptions_keyboard(user_subs, user_lang),
             parse_mode="HTML"
         )
     except Exception:
@@ -158,11 +159,10 @@ async def callback_toggle_subscription(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "sub_my")
-async def callback_my_subscriptions(callback: CallbackQuery):
+async def callback_my_subscriptions(callback: CallbackQuery, user_ctx: UserContext):
     """Show user's active subscriptions"""
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
-    user_subs = get_subscriptions(user_id)
+    user_lang = user_ctx.language
+    user_subs = await user_ctx.get_subscriptions()
     
     if user_subs:
         text = (
@@ -178,31 +178,33 @@ async def callback_my_subscriptions(callback: CallbackQuery):
     try:
         await callback.message.edit_text(
             text,
-            reply_markup=get_my_subscriptions_keyboard(user_id, user_lang),
+            reply_markup=get_my_subscriptions_keyboard(user_subs, user_lang),
             parse_mode="HTML"
         )
     except Exception:
         await callback.message.delete()
         await callback.message.answer(
             text,
-            reply_markup=get_my_subscriptions_keyboard(user_id, user_lang),
+            reply_markup=get_my_subscriptions_keyboard(user_subs, user_lang),
             parse_mode="HTML"
         )
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("sub_off:"))
-async def callback_unsubscribe(callback: CallbackQuery):
+async def callback_unsubscribe(callback: CallbackQuery, user_ctx: UserContext):
     """Unsubscribe from a topic"""
     topic = callback.data.split(":")[1]
-    user_id = callback.from_user.id
-    user_lang = get_user_language(user_id)
+    user_lang = user_ctx.language
     
-    remove_subscription(user_id, topic)
+    await user_ctx.remove_subscription(topic)
+    if not await user_ctx.commit():
+        await callback.answer("❌ Error", show_alert=True)
+        return
     await callback.answer(f"🔕 {get_text(user_lang, 'unsubscribed')}", show_alert=False)
     
     # Refresh the list
-    user_subs = get_subscriptions(user_id)
+    user_subs = await user_ctx.get_subscriptions()
     
     if user_subs:
         text = (
@@ -218,7 +220,7 @@ async def callback_unsubscribe(callback: CallbackQuery):
     try:
         await callback.message.edit_text(
             text,
-            reply_markup=get_my_subscriptions_keyboard(user_id, user_lang),
+            reply_markup=get_my_subscriptions_keyboard(user_subs, user_lang),
             parse_mode="HTML"
         )
     except Exception:
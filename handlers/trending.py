@@ -2,6 +2,8 @@
 Trending Handler - Display trending movies and series - Localized
 """
 
+from typing import Optional
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
@@ -9,40 +11,42 @@ from aiogram.filters import Command
 from tmdb_client import tmdb
 from keyboards.inline import get_trending_keyboard, get_back_keyboard
 from translations import get_text, get_tmdb_language
-from user_prefs import get_user_language
+from middlewares.user_context import UserContext
 
 router = Router()
 
 
 @router.message(Command("trending"))
-async def cmd_trending(message: Message):
+async def cmd_trending(message: Message, user_ctx: UserContext):
     """Handle /trending command"""
-    user_lang = get_user_language(message.from_user.id)
-    await show_trending(message, page=1, lang=user_lang)
+    user_lang = user_ctx.language
+    await show_trending(message, page=1, lang=user_lang, user_ctx=user_ctx)
 
 
 @router.callback_query(F.data.startswith("trending:"))
-async def callback_trending(callback: CallbackQuery):
+async def callback_trending(callback: CallbackQuery, user_ctx: UserContext):
     """Handle trending pagination"""
     page = int(callback.data.split(":")[1])
-    user_lang = get_user_language(callback.from_user.id)
-    await show_trending(callback.message, page=page, edit=True, lang=user_lang)
+    user_lang = user_ctx.language
+    await show_trending(callback.message, page=page, edit=True, lang=user_lang, user_ctx=user_ctx)
     await callback.answer()
 
 
-async def show_trending(message: Message, page: int = 1, edit: bool = False, lang: str = "en"):
+async def show_trending(message: Message, page: int = 1, edit: bool = False, lang: str = "en", user_ctx: Optional[UserContext] = None):
     """Show trending content (movies and series)"""
     tmdb_lang = get_tmdb_language(lang)
     data = await tmdb.get_trending(media_type="all", time_window="week", page=page, language=tmdb_lang)
-    results = data.get("results", [])
-    total_pages = min(data.get("total_pages", 1), 50)  # Cap at 50 pages
+    results = data.results
+    total_pages = min(data.total_pages, 50)  # Cap at 50 pages
+    if page < total_pages:
+        tmdb.prefetch(tmdb.get_trending, media_type="all", time_window="week", page=page + 1, language=tmdb_lang)
     
     if not results:
         text = get_text(lang, "no_results")
         keyboard = get_back_keyboard(lang)
     else:
         item = results[0]
-        media_type = item.get("media_type", "movie")
+        media_type = item.media_type
         
         # Format based on type
         if media_type == "movie":
@@ -56,14 +60,15 @@ async def show_trending(message: Message, page: int = 1, edit: bool = False, lan
         keyboard = get_trending_keyboard(
             page=page,
             total_pages=total_pages,
-            item_id=item.get("id"),
+            item_id=item.id,
             media_type=media_type,
-            lang=lang
+            lang=lang,
+            is_saved=await user_ctx.is_favorite("movies" if media_type == "movie" else "series", item.id) if user_ctx else None
         )
     
     if edit:
         try:
-            poster_url = tmdb.get_poster_url(results[0].get("poster_path")) if results else None
+            poster_url = tmdb.get_poster_url(results[0].poster_path) if results else None
             if poster_url:
                 await message.delete()
                 await message.answer_photo(
@@ -81,7 +86,7 @@ async def show_trending(message: Message, page: int = 1, edit: bool = False, lan
                 pass
             await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
     else:
-        poster_url = tmdb.get_poster_url(results[0].get("poster_path")) if results else None
+        poster_url = tmdb.get_poster_url(results[0].poster_path) if results else None
         if poster_url:
             await message.answer_photo(
                 photo=poster_url,
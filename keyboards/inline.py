@@ -34,6 +34,25 @@ def get_main_menu_localized(lang: str = "en") -> InlineKeyboardMarkup:
     ])
 
 
+def get_favorite_button(media_type: str, item_id: int, is_saved: bool, lang: str = "en") -> InlineKeyboardButton:
+    """Favorite button for a card: a saved badge, or a button to save it"""
+    if is_saved:
+        return InlineKeyboardButton(text="⭐ " + get_text(lang, "fav_saved"), callback_data="noop")
+    return InlineKeyboardButton(text="☆ " + get_text(lang, "fav_add_btn"), callback_data=f"fav_add:{media_type}:{item_id}")
+
+
+def mark_favorite_saved(keyboard: InlineKeyboardMarkup, lang: str = "en") -> InlineKeyboardMarkup:
+    """Copy of a card keyboard with its add-to-favorites button turned into the saved badge"""
+    rows = []
+    for row in keyboard.inline_keyboard:
+        rows.append([
+            InlineKeyboardButton(text="⭐ " + get_text(lang, "fav_saved"), callback_data="noop")
+            if (button.callback_data or "").startswith("fav_add:") else button
+            for button in row
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
 def get_main_menu() -> InlineKeyboardMarkup:
     """Main menu keyboard - default English"""
     return get_main_menu_localized("en")
@@ -44,7 +63,8 @@ def get_movies_keyboard(
     total_pages: int,
     movie_id: Optional[int] = None,
     has_trailer: bool = False,
-    lang: str = "en"
+    lang: str = "en",
+    is_saved: Optional[bool] = None
 ) -> InlineKeyboardMarkup:
     """Keyboard for movie display with navigation"""
     buttons = []
@@ -57,6 +77,8 @@ def get_movies_keyboard(
         action_row.append(InlineKeyboardButton(text=get_text(lang, "details"), callback_data=f"details_movie:{movie_id}"))
     if action_row:
         buttons.append(action_row)
+    if movie_id and is_saved is not None:
+        buttons.append([get_favorite_button("movies", movie_id, is_saved, lang)])
     
     # Navigation row
     nav_row = []
@@ -78,7 +100,8 @@ def get_series_keyboard(
     total_pages: int,
     series_id: Optional[int] = None,
     has_trailer: bool = False,
-    lang: str = "en"
+    lang: str = "en",
+    is_saved: Optional[bool] = None
 ) -> InlineKeyboardMarkup:
     """Keyboard for series display with navigation"""
     buttons = []
@@ -91,6 +114,8 @@ def get_series_keyboard(
         action_row.append(InlineKeyboardButton(text=get_text(lang, "details"), callback_data=f"details_series:{series_id}"))
     if action_row:
         buttons.append(action_row)
+    if series_id and is_saved is not None:
+        buttons.append([get_favorite_button("series", series_id, is_saved, lang)])
     
     # Navigation row
     nav_row = []
@@ -112,7 +137,8 @@ def get_trending_keyboard(
     total_pages: int,
     item_id: Optional[int] = None,
     media_type: str = "movie",
-    lang: str = "en"
+    lang: str = "en",
+    is_saved: Optional[bool] = None
 ) -> InlineKeyboardMarkup:
     """Keyboard for trending display with navigation"""
     buttons = []
@@ -123,6 +149,9 @@ def get_trending_keyboard(
         action_row.append(InlineKeyboardButton(text=get_text(lang, "details"), callback_data=f"details_{media_type}:{item_id}"))
     if action_row:
         buttons.append(action_row)
+    if item_id and is_saved is not None:
+        fav_type = "movies" if media_type == "movie" else "series"
+        buttons.append([get_favorite_button(fav_type, item_id, is_saved, lang)])
     
     # Navigation row
     nav_row = []
@@ -139,12 +168,14 @@ def get_trending_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def get_popular_movies_keyboard(page: int, total_pages: int, movie_id: Optional[int] = None, lang: str = "en") -> InlineKeyboardMarkup:
+def get_popular_movies_keyboard(page: int, total_pages: int, movie_id: Optional[int] = None, lang: str = "en", is_saved: Optional[bool] = None) -> InlineKeyboardMarkup:
     """Keyboard for popular movies with navigation"""
     buttons = []
     
     if movie_id:
         buttons.append([InlineKeyboardButton(text=get_text(lang, "details"), callback_data=f"details_movie:{movie_id}")])
+    if movie_id and is_saved is not None:
+        buttons.append([get_favorite_button("movies", movie_id, is_saved, lang)])
     
     nav_row = []
     if page > 1:
@@ -159,12 +190,14 @@ def get_popular_movies_keyboard(page: int, total_pages: int, movie_id: Optional[
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def get_popular_series_keyboard(page: int, total_pages: int, series_id: Optional[int] = None, lang: str = "en") -> InlineKeyboardMarkup:
+def get_popular_series_keyboard(page: int, total_pages: int, series_id: Optional[int] = None, lang: str = "en", is_saved: Optional[bool] = None) -> InlineKeyboardMarkup:
     """Keyboard for popular series with navigation"""
     buttons = []
     
     if series_id:
         buttons.append([InlineKeyboardButton(text=get_text(lang, "details"), callback_data=f"details_series:{series_id}")])
+    if series_id and is_saved is not None:
+        buttons.append([get_favorite_button("series", series_id, is_saved, lang)])
     
     nav_row = []
     if page > 1:
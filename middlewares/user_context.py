@@ -0,0 +1,165 @@
+"""
+User Context Middleware - Load a user's preferences at most once per update
+Handlers receive a `user_ctx` argument instead of querying storage themselves;
+changes made through it are committed in one batch when the handler returns,
+or earlier with `await user_ctx.commit()` before a confirmation is shown
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from user_prefs import prefs, SUBSCRIPTION_TOPICS
+
+logger = logging.getLogger(__name__)
+
+
+def _favorite(item_id: int, title: str, poster_path: Optional[str] = None) -> Dict:
+    """Favorite record as the backends return it"""
+    return {
+        "id": item_id,
+        "title": title,
+        "poster_path": poster_path,
+        "added_at": datetime.now().isoformat()
+    }
+
+
+class UserContext:
+    """One user's preferences plus the changes made during an update.
+
+    Only the language is read up front. Favorites of a media type and the
+    subscriptions are loaded on first access, so callbacks that only need the
+    language cost a single read; the saved badge on a card and the add/remove
+    toggles ask the backend about that one title. Loaded favorites are indexed
+    by item id in insertion order, so lookups and removals do not scan the list.
+    """
+
+    def __init__(self, user_id: int, language: str):
+        self.user_id = user_id
+        self.language = language
+        self._favorites: Dict[str, Dict[int, Dict]] = {}
+        # (media_type, item_id) -> saved, for items checked or toggled without loading the list
+        self._saved: Dict[Tuple[str, int], bool] = {}
+        self._subscriptions: Optional[List[str]] = None
+        self.changes: List[tuple] = []
+
+    async def commit(self) -> bool:
+        """Save the queued changes now, so a handler can confirm them only once stored.
+        Returns False (and drops them) if they could not be saved."""
+        if not self.changes:
+            return True
+        changes, self.changes = self.changes, []
+        try:
+            await prefs.apply_changes(self.user_id, changes)
+        except Exception:
+            logger.exception("Failed to save preferences of user %s", self.user_id)
+            return False
+        return True
+
+    # ============ Language ============
+
+    def set_language(self, language: str) -> None:
+        self.language = language
+        self.changes.append(("set_language", language))
+
+    # ============ Favorites ============
+
+    async def _load_favorites(self, media_type: str) -> Dict[int, Dict]:
+        favorites = self._favorites.get(media_type)
+        if favorites is None:
+            items = await prefs.get_favorites(self.user_id, media_type)
+            favorites = self._favorites[media_type] = {fav.get("id"): fav for fav in items}
+            # Changes queued during this update are not in the backend yet
+            for name, *args in self.changes:
+                if name == "add_favorite" and args[0] == media_type:
+                    favorites.setdefault(args[1], _favorite(*args[1:]))
+                elif name == "remove_favorite" and args[0] == media_type:
+                    favorites.pop(args[1], None)
+        return favorites
+
+    async def get_favorites(self, media_type: str = "movies") -> List[Dict]:
+        return list((await self._load_favorites(media_type)).values())
+
+    async def is_favorite(self, media_type: str, item_id: int) -> bool:
+        """Checked against what this update knows, otherwise asked of the backend for this one item"""
+        saved = self._saved.get((media_type, item_id))
+        if saved is None:
+            favorites = self._favorites.get(media_type)
+            if favorites is not None:
+                return item_id in favorites
+            saved = self._saved[(media_type, item_id)] = await prefs.is_favorite(self.user_id, media_type, item_id)
+        return saved
+
+    async def add_favorite(self, media_type: str, item_id: int, title: str, poster_path: Optional[str] = None) -> bool:
+        """Add item to favorites. Returns True if added, False if already exists."""
+        if await self.is_favorite(media_type, item_id):
+            return False
+        self._saved[(media_type, item_id)] = True
+        favorites = self._favorites.get(media_type)
+        if favorites is not None:
+            favorites[item_id] = _favorite(item_id, title, poster_path)
+        self.changes.append(("add_favorite", media_type, item_id, title, poster_path))
+        return True
+
+    async def remove_favorite(self, media_type: str, item_id: int) -> bool:
+        """Remove item from favorites. Returns True if removed, False if not found."""
+        if not await self.is_favorite(media_type, item_id):
+            return False
+        self._saved[(media_type, item_id)] = False
+        favorites = self._favorites.get(media_type)
+        if favorites is not None:
+            favorites.pop(item_id, None)
+        self.changes.append(("remove_favorite", media_type, item_id))
+        return True
+
+    # ============ Subscriptions ============
+
+    async def get_subscriptions(self) -> List[str]:
+        if self._subscriptions is None:
+            self._subscriptions = await prefs.get_subscriptions(self.user_id)
+        return self._subscriptions
+
+    async def is_subscribed(self, topic: str) -> bool:
+        return topic in await self.get_subscriptions()
+
+    async def add_subscription(self, topic: str) -> bool:
+        """Subscribe to a topic. Returns True if subscribed, False if already subscribed."""
+        subscriptions = await self.get_subscriptions()
+        if topic not in SUBSCRIPTION_TOPICS or topic in subscriptions:
+            return False
+        subscriptions.append(topic)
+        self.changes.append(("add_subscription", topic))
+        return True
+
+    async def remove_subscription(self, topic: str) -> bool:
+        """Unsubscribe from a topic. Returns True if unsubscribed, False if not found."""
+        subscriptions = await self.get_subscriptions()
+        if topic not in subscriptions:
+            return False
+        subscriptions.remove(topic)
+        self.changes.append(("remove_subscription", topic))
+        return True
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Outer middleware that injects `user_ctx` and commits its changes after the handler"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        user_ctx = UserContext(user.id, await prefs.get_language(user.id))
+        data["user_ctx"] = user_ctx
+        try:
+            return await handler(event, data)
+        finally:
+            await user_ctx.commit()
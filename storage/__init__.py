@@ -0,0 +1,31 @@
+"""
+Storage module - User preferences backends
+"""
+
+from storage.base import PrefsBackend
+
+
+def create_backend(name: str, **options) -> PrefsBackend:
+    """Create a preferences backend by name: "json", "sqlite" or "kv".
+
+    Options: `path` and `journal_max_bytes` (json), `path` and
+    `busy_timeout_ms` (sqlite), `url` and `prefix` (kv; a url of
+    "memory://" uses the in-process fake server).
+    """
+    if name == "json":
+        from storage.json_store import JSONStore
+        return JSONStore(options["path"], journal_max_bytes=options.get("journal_max_bytes", 1024 * 1024))
+    if name == "sqlite":
+        from storage.sqlite_store import SQLiteStore
+        return SQLiteStore(options["path"], busy_timeout_ms=options.get("busy_timeout_ms", 5000))
+    if name == "kv":
+        from storage.kv_store import KVStore
+        from storage.resp import RespClient
+        url = options.get("url", "redis://localhost:6379/0")
+        if url.startswith("memory://"):
+            from storage.fake_redis import FakeRedis
+            client = FakeRedis().client()
+        else:
+            client = RespClient(url)
+        return KVStore(client, prefix=options.get("prefix", "prefs:"))
+    raise ValueError(f"Unknown preferences backend: {name}")
@@ -0,0 +1,90 @@
+"""
+Storage backend interface for user preferences
+Every backend (JSON, SQLite, key-value) implements PrefsBackend; user_prefs
+only talks to this interface
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional
+
+
+class PrefsBackend(ABC):
+    """Interface implemented by every user preferences backend"""
+
+    # ============ Language ============
+
+    @abstractmethod
+    def get_language(self, user_id: int) -> str:
+        """User's language code, "en" if unknown"""
+
+    @abstractmethod
+    def set_language(self, user_id: int, language: str) -> None:
+        """Store the user's language code"""
+
+    # ============ Favorites ============
+
+    @abstractmethod
+    def get_favorites(self, user_id: int, media_type: str) -> List[Dict]:
+        """Favorites of one media type, oldest first"""
+
+    @abstractmethod
+    def add_favorite(self, user_id: int, media_type: str, item_id: int, title: str, poster_path: Optional[str] = None) -> bool:
+        """Returns True if added, False if already saved"""
+
+    @abstractmethod
+    def remove_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        """Returns True if removed, False if not saved"""
+
+    @abstractmethod
+    def is_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        """Whether the item is saved"""
+
+    # ============ Subscriptions ============
+
+    @abstractmethod
+    def get_subscriptions(self, user_id: int) -> List[str]:
+        """Topics the user is subscribed to"""
+
+    @abstractmethod
+    def add_subscription(self, user_id: int, topic: str) -> bool:
+        """Returns True if subscribed, False if already subscribed"""
+
+    @abstractmethod
+    def remove_subscription(self, user_id: int, topic: str) -> bool:
+        """Returns True if unsubscribed, False if not subscribed"""
+
+    @abstractmethod
+    def is_subscribed(self, user_id: int, topic: str) -> bool:
+        """Whether the user is subscribed to the topic"""
+
+    @abstractmethod
+    def get_all_subscribers(self, topic: str) -> List[int]:
+        """All subscriber ids of a topic, ascending"""
+
+    @abstractmethod
+    def iter_subscribers(self, topic: str, chunk_size: int) -> Iterator[List[int]]:
+        """Subscriber ids of a topic in ascending chunks of at most `chunk_size`"""
+
+    # ============ Per-update access ============
+
+    def apply(self, user_id: int, changes: List[tuple]) -> None:
+        """Apply a batch of (method, *args) changes for one user"""
+        for name, *args in changes:
+            getattr(self, name)(user_id, *args)
+
+    # ============ Persistence ============
+
+    def sync(self) -> bool:
+        """Persist pending changes. Returns True if compact() is due."""
+        return False
+
+    def compact(self) -> bool:
+        """Rewrite the backend's files. Returns True if a snapshot was written."""
+        return False
+
+    def flush(self) -> bool:
+        """Persist pending changes and compact when due. Returns True if a snapshot was written."""
+        return self.sync() and self.compact()
+
+    def close(self) -> None:
+        """Release files and connections"""
@@ -0,0 +1,253 @@
+"""
+In-process Redis protocol server for offline use and tests
+Speaks RESP over a socketpair and implements the handful of hash, set and
+sorted-set commands the key-value preferences backend needs
+"""
+
+import queue
+import socket
+import threading
+from typing import Any, Dict, List, Optional
+
+from storage.resp import RespClient, RespError
+
+
+def _read_command(stream) -> List[str]:
+    """Read one RESP array of bulk strings sent by a client"""
+    line = stream.readline()
+    if not line:
+        return []
+    count = int(line[1:-2])
+    args = []
+    for _ in range(count):
+        length = int(stream.readline()[1:-2])
+        args.append(stream.read(length + 2)[:-2].decode("utf-8"))
+    return args
+
+
+def _encode_reply(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode("utf-8")
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode_reply(v) for v in value)
+    if value == "OK" or value == "QUEUED" or value == "PONG":
+        return b"+%s\r\n" % value.encode("utf-8")
+    data = str(value).encode("utf-8")
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def _score(value: str) -> float:
+    if value in ("+inf", "inf"):
+        return float("inf")
+    if value == "-inf":
+        return float("-inf")
+    if value.startswith("("):
+        return float(value[1:])
+    return float(value)
+
+
+class FakeRedis:
+    """Shared in-memory keyspace; every `client()` gets its own connection to it"""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def client(self) -> RespClient:
+        """Open a Redis protocol connection served by a background thread"""
+        server_sock, client_sock = socket.socketpair()
+        thread = threading.Thread(target=self._serve, args=(server_sock,), daemon=True)
+        thread.start()
+        return RespClient(sock=client_sock)
+
+    def _serve(self, sock: socket.socket) -> None:
+        stream = sock.makefile("rwb")
+        replies: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        writer = threading.Thread(target=self._write_replies, args=(stream, replies), daemon=True)
+        writer.start()
+        queued = None
+        try:
+            while True:
+                args = _read_command(stream)
+                if not args:
+                    return
+                name = args[0].upper()
+                if name == "MULTI":
+                    queued = []
+                    reply = "OK"
+                elif name == "EXEC":
+                    with self._lock:
+                        reply = [self._run(cmd) for cmd in queued or []]
+                    queued = None
+                elif queued is not None:
+                    queued.append(args)
+                    reply = "QUEUED"
+                else:
+                    with self._lock:
+                        reply = self._run(args)
+                replies.put(_encode_reply(reply))
+        except (OSError, ValueError):
+            return
+        finally:
+            replies.put(None)
+            writer.join()
+            stream.close()
+            sock.close()
+
+    @staticmethod
+    def _write_replies(stream, replies: "queue.Queue[Optional[bytes]]") -> None:
+        """Send replies from their own thread so a pipelining client never deadlocks the reader"""
+        try:
+            while True:
+                data = replies.get()
+                if data is None:
+                    return
+                stream.write(data)
+                if replies.empty():
+                    stream.flush()
+        except (OSError, ValueError):
+            return
+
+    def _run(self, args: List[str]) -> Any:
+        name, *rest = args
+        handler = getattr(self, "_cmd_" + name.lower(), None)
+        if handler is None:
+            return RespError(f"ERR unknown command '{name}'")
+        try:
+            return handler(*rest)
+        except (TypeError, ValueError):
+            return RespError(f"ERR wrong arguments for '{name}'")
+
+    def _get(self, key: str, kind: type):
+        value = self.data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise ValueError("WRONGTYPE")
+        return value
+
+    # ============ Generic ============
+
+    def _cmd_ping(self) -> str:
+        return "PONG"
+
+    def _cmd_del(self, *keys) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def _cmd_exists(self, *keys) -> int:
+        return sum(key in self.data for key in keys)
+
+    def _cmd_flushdb(self) -> str:
+        self.data.clear()
+        return "OK"
+
+    # ============ Hashes ============
+
+    def _cmd_hget(self, key, field):
+        return (self._get(key, dict) or {}).get(field)
+
+    def _cmd_hset(self, key, *pairs) -> int:
+        h = self.data.setdefault(key, {})
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in h
+            h[field] = value
+        return added
+
+    def _cmd_hsetnx(self, key, field, value) -> int:
+        h = self.data.setdefault(key, {})
+        if field in h:
+            return 0
+        h[field] = value
+        return 1
+
+    def _cmd_hdel(self, key, *fields) -> int:
+        h = self._get(key, dict) or {}
+        removed = sum(h.pop(field, None) is not None for field in fields)
+        if not h:
+            self.data.pop(key, None)
+        return removed
+
+    def _cmd_hexists(self, key, field) -> int:
+        return int(field in (self._get(key, dict) or {}))
+
+    def _cmd_hgetall(self, key) -> List[str]:
+        return [item for pair in (self._get(key, dict) or {}).items() for item in pair]
+
+    # ============ Sets ============
+
+    def _cmd_sadd(self, key, *members) -> int:
+        s = self.data.setdefault(key, set())
+        before = len(s)
+        s.update(members)
+        return len(s) - before
+
+    def _cmd_srem(self, key, *members) -> int:
+        s = self._get(key, set) or set()
+        removed = sum(1 for m in members if m in s)
+        s.difference_update(members)
+        if not s:
+            self.data.pop(key, None)
+        return removed
+
+    def _cmd_sismember(self, key, member) -> int:
+        return int(member in (self._get(key, set) or set()))
+
+    def _cmd_smembers(self, key) -> List[str]:
+        return sorted(self._get(key, set) or set())
+
+    # ============ Sorted sets ============
+
+    def _sorted(self, key) -> List[tuple]:
+        z = self._get(key, dict) or {}
+        return sorted((score, member) for member, score in z.items())
+
+    def _cmd_zadd(self, key, *args) -> int:
+        only_new = bool(args) and args[0].upper() == "NX"
+        pairs = args[1:] if only_new else args
+        z = self.data.setdefault(key, {})
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            if member in z and only_new:
+                continue
+            added += member not in z
+            z[member] = float(score)
+        return added
+
+    def _cmd_zrem(self, key, *members) -> int:
+        z = self._get(key, dict) or {}
+        removed = sum(z.pop(m, None) is not None for m in members)
+        if not z:
+            self.data.pop(key, None)
+        return removed
+
+    def _cmd_zscore(self, key, member) -> Optional[str]:
+        score = (self._get(key, dict) or {}).get(member)
+        return None if score is None else repr(score)
+
+    def _cmd_zcard(self, key) -> int:
+        return len(self._get(key, dict) or {})
+
+    def _cmd_zrange(self, key, start, stop) -> List[str]:
+        members = [member for _, member in self._sorted(key)]
+        start, stop = int(start), int(stop)
+        stop = len(members) + stop if stop < 0 else stop
+        return members[start:stop + 1]
+
+    def _cmd_zrangebyscore(self, key, low, high, *options) -> List[str]:
+        exclusive_low = low.startswith("(")
+        exclusive_high = high.startswith("(")
+        low, high = _score(low), _score(high)
+        members = [
+            member for score, member in self._sorted(key)
+            if (score > low if exclusive_low else score >= low)
+            and (score < high if exclusive_high else score <= high)
+        ]
+        if options and options[0].upper() == "LIMIT":
+            offset, count = int(options[1]), int(options[2])
+            members = members[offset:offset + count if count >= 0 else None]
+        return members
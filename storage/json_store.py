@@ -0,0 +1,380 @@
+"""
+JSON file store for user preferences
+The model lives in memory. Each mutation is appended to a journal as one small
+record; a background compactor folds the journal into a new JSON snapshot once
+it grows past a size threshold. Startup loads the snapshot and replays the
+journal over it.
+"""
+
+import bisect
+import itertools
+import json
+import logging
+import marshal
+import os
+import tempfile
+import threading
+from typing import Dict, Iterator, List, Optional
+from datetime import datetime
+
+from storage.base import PrefsBackend
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single process assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Users per chunk when the model is copied for a snapshot
+FREEZE_CHUNK_USERS = 1000
+
+
+class StoreLockedError(RuntimeError):
+    """Another process already owns the JSON preferences file"""
+
+
+def _new_user() -> Dict:
+    """Default record for a user we have not seen yet"""
+    return {"language": "en", "favorites": {"movies": {}, "series": {}}, "subscriptions": []}
+
+
+class JSONStore(PrefsBackend):
+    """User preferences kept in memory, persisted as a JSON snapshot plus a journal.
+
+    Journal records are idempotent (set language, add/remove favorite,
+    add/remove subscription), so replaying a journal that was already folded
+    into the snapshot - e.g. after a crash mid-compaction - is harmless.
+
+    In memory, each favorites list is a dict keyed by item id (insertion
+    ordered), so membership checks and removals are O(1); snapshots keep
+    the list layout of user_prefs.json.
+
+    The in-memory model cannot see other processes' writes, so the store
+    takes an exclusive lock on `<path>.lock` for its lifetime and refuses
+    to open if another process holds it. Use the sqlite backend to run
+    several bot workers.
+    """
+
+    def __init__(self, path: str, journal_max_bytes: int = 1024 * 1024):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.journal_max_bytes = journal_max_bytes
+        self._lock_file = self._acquire_process_lock()
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._prefs = self._load_prefs()
+        self._subscribers: Dict[str, List[int]] = {}
+
+        # A journal left over from an interrupted compaction comes first
+        replayed = self._replay(self.journal_path + ".1") + self._replay(self.journal_path)
+        if replayed:
+            logger.info("Replayed %d journal records over %s", replayed, self.path)
+        self._subscribers = self._build_subscriber_index()
+        self._journal = open(self.journal_path, "a", encoding="utf-8", buffering=1)
+
+    def _acquire_process_lock(self):
+        """Hold an exclusive lock so a second process cannot silently diverge"""
+        lock_file = open(self.path + ".lock", "a")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise StoreLockedError(
+                f"{self.path} is in use by another process; "
+                "set PREFS_BACKEND=sqlite to run several workers"
+            )
+        return lock_file
+
+    def _load_prefs(self) -> Dict:
+        """Load the last snapshot from file"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                prefs = json.load(f)
+        except Exception:
+            logger.exception("Failed to read %s, starting with empty preferences", self.path)
+            return {}
+
+        for user_data in prefs.values():
+            favorites = user_data.get("favorites", {})
+            for media_type, items in favorites.items():
+                favorites[media_type] = {fav.get("id"): fav for fav in items}
+        return prefs
+
+    def _freeze(self) -> List[bytes]:
+        """Copy of the model taken under the lock, in chunks of users.
+
+        marshal copies plain dicts, lists and strings in C, an order of
+        magnitude faster than building the snapshot, so writers only wait
+        for this; `_snapshot` rebuilds the layout outside the lock, and the
+        chunks keep each step there short enough not to hog the GIL.
+        """
+        with self._lock:
+            users = iter(self._prefs.items())
+            frozen = []
+            while True:
+                chunk = dict(itertools.islice(users, FREEZE_CHUNK_USERS))
+                if not chunk:
+                    return frozen
+                frozen.append(marshal.dumps(chunk))
+
+    @staticmethod
+    def _snapshot(frozen: List[bytes]) -> Dict:
+        """A frozen model in user_prefs.json layout, with favorites as lists"""
+        return {
+            user_key: {
+                **user_data,
+                "favorites": {
+                    media_type: list(items.values())
+                    for media_type, items in user_data.get("favorites", {}).items()
+                },
+            }
+            for chunk in frozen
+            for user_key, user_data in marshal.loads(chunk).items()
+        }
+
+    @staticmethod
+    def _write_snapshot(f, snapshot: Dict) -> None:
+        """Serialize one user at a time, so other threads get the GIL in between"""
+        f.write("{")
+        for i, (user_key, user_data) in enumerate(snapshot.items()):
+            f.write((", " if i else "") + json.dumps(user_key) + ": " + json.dumps(user_data, ensure_ascii=False))
+        f.write("}")
+
+    def _replay(self, journal_path: str) -> int:
+        """Apply every record of a journal file to the model"""
+        if not os.path.exists(journal_path):
+            return 0
+        count = 0
+        valid_bytes = 0
+        with open(journal_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn last record from a crash mid-append
+                    logger.warning("Dropping incomplete journal record in %s", journal_path)
+                    break
+                valid_bytes += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping unreadable journal record in %s", journal_path)
+                    continue
+                self._apply(record)
+                count += 1
+        if valid_bytes < os.path.getsize(journal_path):
+            os.truncate(journal_path, valid_bytes)
+        return count
+
+    def _build_subscriber_index(self) -> Dict[str, List[int]]:
+        """Inverted index: topic -> sorted list of subscribed user ids"""
+        index: Dict[str, List[int]] = {}
+        for user_key, user_data in self._prefs.items():
+            try:
+                user_id = int(user_key)
+            except ValueError:
+                continue
+            for topic in user_data.get("subscriptions", []):
+                index.setdefault(topic, []).append(user_id)
+        for ids in index.values():
+            ids.sort()
+        return index
+
+    def _user(self, user_id: int) -> Dict:
+        """Get user data for writing, creating if not exists"""
+        return self._prefs.setdefault(str(user_id), _new_user())
+
+    def _favorites(self, user_id: int, media_type: str) -> Dict[int, Dict]:
+        return self._user(user_id).setdefault("favorites", {"movies": {}, "series": {}}).setdefault(media_type, {})
+
+    def _apply(self, record: list) -> bool:
+        """Apply one journal record to the model. Returns False if it changed nothing."""
+        op, user_id = record[0], record[1]
+
+        if op == "lang":
+            self._user(user_id)["language"] = record[2]
+            return True
+
+        if op == "fav+":
+            items = self._favorites(user_id, record[2])
+            if record[3]["id"] in items:
+                return False
+            items[record[3]["id"]] = record[3]
+            return True
+
+        if op == "fav-":
+            return self._favorites(user_id, record[2]).pop(record[3], None) is not None
+
+        if op == "sub+":
+            subs = self._user(user_id).setdefault("subscriptions", [])
+            if record[2] in subs:
+                return False
+            subs.append(record[2])
+            bisect.insort(self._subscribers.setdefault(record[2], []), int(user_id))
+            return True
+
+        if op == "sub-":
+            subs = self._user(user_id).setdefault("subscriptions", [])
+            if record[2] not in subs:
+                return False
+            subs.remove(record[2])
+            ids = self._subscribers.get(record[2], [])
+            i = bisect.bisect_left(ids, int(user_id))
+            if i < len(ids) and ids[i] == int(user_id):
+                ids.pop(i)
+            return True
+
+        logger.warning("Unknown journal record: %r", record)
+        return False
+
+    def _commit(self, record: list) -> bool:
+        """Apply a mutation and append it to the journal if it changed anything"""
+        with self._lock:
+            if not self._apply(record):
+                return False
+            self._journal.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            return True
+
+    # ============ Persistence ============
+
+    def sync(self) -> bool:
+        """Sync the journal to disk. Returns True once it passed the size threshold."""
+        with self._lock:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            size = self._journal.tell()
+        return size >= self.journal_max_bytes
+
+    def compact(self) -> bool:
+        """Fold the journal into a new snapshot.
+
+        The model is frozen and the journal rotated aside under the lock, so
+        writers only wait for the copy; building and serializing the snapshot
+        and writing it to disk happen outside the lock. The snapshot is replaced
+        atomically (temp file + os.replace) before the rotated journal is
+        deleted.
+        """
+        with self._compact_lock:
+            rotated = self.journal_path + ".1"
+            with self._lock:
+                frozen = self._freeze()
+                self._journal.close()
+                if os.path.exists(rotated):
+                    # Left over from a failed compaction: keep its records first
+                    with open(rotated, "a", encoding="utf-8") as dst, open(self.journal_path, "r", encoding="utf-8") as src:
+                        dst.write(src.read())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, rotated)
+                self._journal = open(self.journal_path, "a", encoding="utf-8", buffering=1)
+
+            snapshot = self._snapshot(frozen)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".user_prefs.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    self._write_snapshot(f, snapshot)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except Exception:
+                logger.exception("Failed to write preferences snapshot %s", self.path)
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                return False
+
+            os.remove(rotated)
+            return True
+
+    def export(self) -> Dict:
+        """Every user in user_prefs.json layout, including journaled changes"""
+        return self._snapshot(self._freeze())
+
+    def close(self) -> None:
+        """Sync and close the journal, then release the process lock"""
+        with self._lock:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+            self._lock_file.close()
+
+    # ============ Language ============
+
+    def get_language(self, user_id: int) -> str:
+        return self._prefs.get(str(user_id), {}).get("language", "en")
+
+    def set_language(self, user_id: int, language: str) -> None:
+        self._commit(["lang", str(user_id), language])
+
+    # ============ Favorites ============
+
+    def get_favorites(self, user_id: int, media_type: str) -> List[Dict]:
+        return list(self._prefs.get(str(user_id), {}).get("favorites", {}).get(media_type, {}).values())
+
+    def add_favorite(self, user_id: int, media_type: str, item_id: int, title: str, poster_path: Optional[str] = None) -> bool:
+        return self._commit(["fav+", str(user_id), media_type, {
+            "id": item_id,
+            "title": title,
+            "poster_path": poster_path,
+            "added_at": datetime.now().isoformat()
+        }])
+
+    def remove_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        if not self.is_favorite(user_id, media_type, item_id):
+            return False
+        return self._commit(["fav-", str(user_id), media_type, item_id])
+
+    def is_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        return item_id in self._prefs.get(str(user_id), {}).get("favorites", {}).get(media_type, {})
+
+    # ============ Subscriptions ============
+
+    def get_subscriptions(self, user_id: int) -> List[str]:
+        return list(self._prefs.get(str(user_id), {}).get("subscriptions", []))
+
+    def add_subscription(self, user_id: int, topic: str) -> bool:
+        return self._commit(["sub+", str(user_id), topic])
+
+    def remove_subscription(self, user_id: int, topic: str) -> bool:
+        if not self.is_subscribed(user_id, topic):
+            return False
+        return self._commit(["sub-", str(user_id), topic])
+
+    def is_subscribed(self, user_id: int, topic: str) -> bool:
+        return topic in self._prefs.get(str(user_id), {}).get("subscriptions", [])
+
+    def get_all_subscribers(self, topic: str) -> List[int]:
+        with self._lock:
+            return list(self._subscribers.get(topic, []))
+
+    # ============ Per-update access ============
+
+    def apply(self, user_id: int, changes: List[tuple]) -> None:
+        """Apply a batch of (method, *args) changes for one user"""
+        with self._lock:
+            for name, *args in changes:
+                getattr(self, name)(user_id, *args)
+
+    def iter_subscribers(self, topic: str, chunk_size: int) -> Iterator[List[int]]:
+        """Yield subscriber ids in ascending chunks.
+
+        Each chunk resumes after the last id already yielded, so users added
+        or removed while the caller is busy never break the iteration.
+        """
+        last_id = None
+        while True:
+            with self._lock:
+                ids = self._subscribers.get(topic, [])
+                start = 0 if last_id is None else bisect.bisect_right(ids, last_id)
+                chunk = ids[start:start + chunk_size]
+            if not chunk:
+                return
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+            last_id = chunk[-1]
@@ -0,0 +1,157 @@
+"""
+Key-value store for user preferences over the Redis protocol
+Layout (all keys under a configurable prefix):
+
+    user:{id}                hash   language
+    user:{id}:fav:{media}    hash   item id -> JSON favorite record
+    user:{id}:subs           zset   subscribed topics, scored by time subscribed
+    topic:{topic}            zset   subscriber ids, scored by id
+
+Every hot path is a single-key command, so any number of bot replicas can
+share one server; multi-key changes run in MULTI/EXEC transactions.
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from storage.base import PrefsBackend
+from storage.resp import RespClient
+
+
+class KVStore(PrefsBackend):
+    """User preferences kept in a Redis-protocol key-value server"""
+
+    def __init__(self, client: RespClient, prefix: str = "prefs:"):
+        self._client = client
+        self.prefix = prefix
+        self._last_score = 0
+
+    def close(self) -> None:
+        self._client.close()
+
+    # ============ Keys ============
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self.prefix}user:{user_id}"
+
+    def _fav_key(self, user_id: int, media_type: str) -> str:
+        return f"{self.prefix}user:{user_id}:fav:{media_type}"
+
+    def _subs_key(self, user_id: int) -> str:
+        return f"{self.prefix}user:{user_id}:subs"
+
+    def _topic_key(self, topic: str) -> str:
+        return f"{self.prefix}topic:{topic}"
+
+    @staticmethod
+    def _favorites_from_hash(flat: List[str]) -> List[Dict]:
+        records = [json.loads(value) for value in flat[1::2]]
+        records.sort(key=lambda fav: fav.get("added_at") or "")
+        return records
+
+    def _subscribed_at(self) -> int:
+        """Microseconds since the epoch, strictly increasing within this process,
+        so topics subscribed in one batch keep their order"""
+        self._last_score = max(time.time_ns() // 1000, self._last_score + 1)
+        return self._last_score
+
+    def _commands(self, user_id: int, name: str, *args) -> List[tuple]:
+        """Commands implementing one mutation; the first reply tells whether it changed anything"""
+        if name == "set_language":
+            return [("HSET", self._user_key(user_id), "language", args[0])]
+        if name == "add_favorite":
+            media_type, item_id, title, poster_path = args
+            record = json.dumps({
+                "id": item_id,
+                "title": title,
+                "poster_path": poster_path,
+                "added_at": datetime.now().isoformat()
+            }, ensure_ascii=False)
+            return [("HSETNX", self._fav_key(user_id, media_type), item_id, record)]
+        if name == "remove_favorite":
+            media_type, item_id = args
+            return [("HDEL", self._fav_key(user_id, media_type), item_id)]
+        if name == "add_subscription":
+            return [
+                ("ZADD", self._subs_key(user_id), "NX", self._subscribed_at(), args[0]),
+                ("ZADD", self._topic_key(args[0]), user_id, user_id),
+            ]
+        if name == "remove_subscription":
+            return [
+                ("ZREM", self._subs_key(user_id), args[0]),
+                ("ZREM", self._topic_key(args[0]), user_id),
+            ]
+        raise ValueError(f"Unsupported preference change: {name}")
+
+    def _mutate(self, user_id: int, name: str, *args) -> bool:
+        commands = self._commands(user_id, name, *args)
+        if len(commands) == 1:
+            return bool(self._client.execute(*commands[0]))
+        return bool(self._client.transaction(commands)[0])
+
+    # ============ Language ============
+
+    def get_language(self, user_id: int) -> str:
+        return self._client.execute("HGET", self._user_key(user_id), "language") or "en"
+
+    def set_language(self, user_id: int, language: str) -> None:
+        self._mutate(user_id, "set_language", language)
+
+    # ============ Favorites ============
+
+    def get_favorites(self, user_id: int, media_type: str) -> List[Dict]:
+        return self._favorites_from_hash(self._client.execute("HGETALL", self._fav_key(user_id, media_type)))
+
+    def add_favorite(self, user_id: int, media_type: str, item_id: int, title: str, poster_path: Optional[str] = None) -> bool:
+        return self._mutate(user_id, "add_favorite", media_type, item_id, title, poster_path)
+
+    def remove_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        return self._mutate(user_id, "remove_favorite", media_type, item_id)
+
+    def is_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        return bool(self._client.execute("HEXISTS", self._fav_key(user_id, media_type), item_id))
+
+    # ============ Subscriptions ============
+
+    def get_subscriptions(self, user_id: int) -> List[str]:
+        return self._client.execute("ZRANGE", self._subs_key(user_id), 0, -1)
+
+    def add_subscription(self, user_id: int, topic: str) -> bool:
+        return self._mutate(user_id, "add_subscription", topic)
+
+    def remove_subscription(self, user_id: int, topic: str) -> bool:
+        return self._mutate(user_id, "remove_subscription", topic)
+
+    def is_subscribed(self, user_id: int, topic: str) -> bool:
+        return self._client.execute("ZSCORE", self._subs_key(user_id), topic) is not None
+
+    def get_all_subscribers(self, topic: str) -> List[int]:
+        return [int(uid) for uid in self._client.execute("ZRANGE", self._topic_key(topic), 0, -1)]
+
+    def iter_subscribers(self, topic: str, chunk_size: int) -> Iterator[List[int]]:
+        """Yield subscriber ids in ascending chunks, resuming after the last id seen"""
+        low = "-inf"
+        while True:
+            chunk = [
+                int(uid) for uid in self._client.execute(
+                    "ZRANGEBYSCORE", self._topic_key(topic), low, "+inf", "LIMIT", 0, chunk_size
+                )
+            ]
+            if not chunk:
+                return
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+            low = f"({chunk[-1]}"
+
+    # ============ Per-update access ============
+
+    def apply(self, user_id: int, changes: List[tuple]) -> None:
+        """Apply a batch of changes for one user in one MULTI/EXEC transaction"""
+        commands = []
+        for name, *args in changes:
+            commands.extend(self._commands(user_id, name, *args))
+        if commands:
+            self._client.transaction(commands)
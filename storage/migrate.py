@@ -0,0 +1,87 @@
+"""
+One-shot migration of user_prefs.json into the SQLite store
+
+Usage:
+    python -m storage.migrate [json_file] [db_file]
+
+Defaults to PREFS_FILE and PREFS_DB_FILE from config. The JSON store is
+opened the way the bot opens it, so changes still in its journal are
+migrated too; stop the bot first. Safe to run more than once: rows that
+already exist in the database are left untouched.
+"""
+
+import os
+import sys
+from typing import Optional
+
+from config import PREFS_FILE, PREFS_DB_FILE
+from storage.json_store import JSONStore
+from storage.sqlite_store import SQLiteStore
+
+
+def json_store_exists(json_path: str) -> bool:
+    """Whether there is a snapshot or journal to migrate"""
+    return any(os.path.exists(path) for path in (json_path, json_path + ".journal", json_path + ".journal.1"))
+
+
+def import_json_store(store: SQLiteStore, json_path: str = PREFS_FILE, only_if_empty: bool = False) -> Optional[dict]:
+    """Copy every user from the JSON store (snapshot plus journal) into an open SQLite store.
+
+    The journal is folded into user_prefs.json first, so the snapshot stays
+    complete and the journal and lock files the JSON store leaves behind are
+    removed afterwards. With `only_if_empty`, the database is checked again
+    once the JSON store's lock is held and None is returned if another worker
+    already imported it. Raises StoreLockedError while another process holds
+    the JSON store.
+    """
+    source = JSONStore(json_path)
+    try:
+        if only_if_empty and not store.is_empty():
+            counts = None
+        else:
+            source.compact()
+            counts = store.import_users(source.export())
+    finally:
+        source.close()
+    _remove_leftovers(json_path)
+    return counts
+
+
+def _remove_leftovers(json_path: str) -> None:
+    """Delete the empty journal and the lock file opening the JSON store creates"""
+    journal_path = json_path + ".journal"
+    if os.path.exists(journal_path) and os.path.getsize(journal_path) == 0:
+        os.remove(journal_path)
+    try:
+        os.remove(json_path + ".lock")
+    except FileNotFoundError:
+        pass
+
+
+def migrate(json_path: str = PREFS_FILE, db_path: str = PREFS_DB_FILE) -> dict:
+    """Copy every user from the JSON store (snapshot plus journal) into the SQLite database"""
+    store = SQLiteStore(db_path)
+    try:
+        return import_json_store(store, json_path)
+    finally:
+        store.close()
+
+
+def main(argv: list) -> int:
+    json_path = argv[1] if len(argv) > 1 else PREFS_FILE
+    db_path = argv[2] if len(argv) > 2 else PREFS_DB_FILE
+
+    if not json_store_exists(json_path):
+        print(f"❌ {json_path} not found, nothing to migrate")
+        return 1
+
+    counts = migrate(json_path, db_path)
+    print(
+        f"✅ Migrated {counts['users']} users, {counts['favorites']} favorites "
+        f"and {counts['subscriptions']} subscriptions into {db_path}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
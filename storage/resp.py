@@ -0,0 +1,162 @@
+"""
+Minimal Redis protocol (RESP2) client
+Just enough of the wire protocol for the key-value preferences backend:
+single commands, pipelines and MULTI/EXEC transactions over one socket
+"""
+
+import socket
+import threading
+from typing import Any, BinaryIO, List, Optional
+from urllib.parse import urlparse
+
+
+class RespError(Exception):
+    """Error reply sent by the server"""
+
+
+def encode_command(*args) -> bytes:
+    """Encode a command as a RESP array of bulk strings"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def read_reply(stream: BinaryIO) -> Any:
+    """Read one reply; bulk strings are decoded as UTF-8, error replies are returned as RespError"""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, payload = line[:1], line[1:-2]
+
+    if kind == b"+":
+        return payload.decode("utf-8")
+    if kind == b"-":
+        return RespError(payload.decode("utf-8"))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length == -1:
+            return None
+        data = stream.read(length + 2)
+        return data[:-2].decode("utf-8")
+    if kind == b"*":
+        count = int(payload)
+        if count == -1:
+            return None
+        return [read_reply(stream) for _ in range(count)]
+    raise RespError(f"Unexpected reply type: {line!r}")
+
+
+class RespClient:
+    """Redis protocol client over a single connection, safe to share between threads.
+
+    A connection that fails mid-command is closed, since the reply stream can no
+    longer be trusted, and the failure surfaces as ConnectionError. Clients built
+    from a URL reconnect on the next command.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", sock: Optional[socket.socket] = None, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._stream: Optional[BinaryIO] = None
+        # A socket handed in (e.g. by the fake server) cannot be reopened
+        self._reconnectable = sock is None
+        if sock is None:
+            with self._lock:
+                self._connect()
+        else:
+            self._sock = sock
+            self._stream = sock.makefile("rwb")
+
+    def _connect(self) -> None:
+        """Open the connection and authenticate / select the database from the URL"""
+        parsed = urlparse(self.url)
+        try:
+            sock = socket.create_connection((parsed.hostname or "localhost", parsed.port or 6379), timeout=self.timeout)
+        except OSError as e:
+            raise ConnectionError(f"Cannot connect to {parsed.hostname}:{parsed.port or 6379}: {e}") from e
+        self._sock = sock
+        self._stream = sock.makefile("rwb")
+
+        handshake = []
+        if parsed.password:
+            if parsed.username:
+                handshake.append(("AUTH", parsed.username, parsed.password))
+            else:
+                handshake.append(("AUTH", parsed.password))
+        db = (parsed.path or "/0").lstrip("/") or "0"
+        if db != "0":
+            handshake.append(("SELECT", db))
+        if handshake:
+            for reply in self._send(handshake):
+                if isinstance(reply, RespError):
+                    self._disconnect()
+                    raise reply
+
+    def _disconnect(self) -> None:
+        for closable in (self._stream, self._sock):
+            try:
+                if closable is not None:
+                    closable.close()
+            except OSError:
+                pass
+        self._stream = None
+        self._sock = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+    def _send(self, commands: List[tuple]) -> List[Any]:
+        """Write commands and read their replies; caller holds the lock"""
+        if self._stream is None:
+            if not self._reconnectable:
+                raise ConnectionError("Connection to the server is closed")
+            self._connect()
+        try:
+            self._stream.write(b"".join(encode_command(*cmd) for cmd in commands))
+            self._stream.flush()
+            return [read_reply(self._stream) for _ in commands]
+        except Exception as e:
+            # After a timeout or partial read later replies would go to the wrong caller
+            self._disconnect()
+            raise ConnectionError(f"Connection to the server lost: {e}") from e
+
+    def execute(self, *args) -> Any:
+        """Run one command and return its reply"""
+        with self._lock:
+            reply = self._send([args])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """Send several commands in one round trip and return their replies"""
+        with self._lock:
+            replies = self._send(commands)
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def transaction(self, commands: List[tuple]) -> List[Any]:
+        """Run commands atomically with MULTI/EXEC in one round trip"""
+        with self._lock:
+            replies = self._send([("MULTI",), *commands, ("EXEC",)])
+        for reply in replies[:-1]:
+            if isinstance(reply, RespError):
+                raise reply
+        result = replies[-1]
+        if isinstance(result, RespError):
+            raise result
+        if result is None:
+            raise RespError("Transaction aborted")
+        return result
@@ -0,0 +1,244 @@
+"""
+SQLite store for user preferences
+Users, favorites and subscriptions live in indexed tables, so every lookup is a
+B-tree search instead of a full-file parse.
+
+Safe for several bot processes sharing one database file: every write is a
+single atomic statement (INSERT OR IGNORE / DELETE / upsert) or runs inside
+a BEGIN IMMEDIATE transaction, and SQLite transactions are serializable, so
+concurrent add_favorite/add_subscription calls can never lose each other's
+rows. Writers that find the database locked wait up to `busy_timeout_ms`.
+"""
+
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional
+from datetime import datetime
+
+from storage.base import PrefsBackend
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id  INTEGER PRIMARY KEY,
+    language TEXT NOT NULL DEFAULT 'en'
+);
+
+CREATE TABLE IF NOT EXISTS favorites (
+    user_id     INTEGER NOT NULL,
+    media_type  TEXT NOT NULL,
+    item_id     INTEGER NOT NULL,
+    title       TEXT NOT NULL,
+    poster_path TEXT,
+    added_at    TEXT NOT NULL,
+    UNIQUE (user_id, media_type, item_id)
+);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    user_id INTEGER NOT NULL,
+    topic   TEXT NOT NULL,
+    UNIQUE (user_id, topic)
+);
+
+CREATE INDEX IF NOT EXISTS idx_subscriptions_topic ON subscriptions (topic, user_id);
+"""
+
+
+class SQLiteStore(PrefsBackend):
+    """User preferences kept in a SQLite database"""
+
+    def __init__(self, path: str, busy_timeout_ms: int = 5000):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout_ms / 1000, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def flush(self) -> bool:
+        """Nothing to do: every write is committed as it happens"""
+        return False
+
+    def _fetchone(self, sql: str, params: tuple = ()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, sql: str, params: tuple = ()) -> int:
+        """Run a single statement, returning the number of changed rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    # ============ Language ============
+
+    def get_language(self, user_id: int) -> str:
+        row = self._fetchone("SELECT language FROM users WHERE user_id = ?", (user_id,))
+        return row[0] if row else "en"
+
+    def set_language(self, user_id: int, language: str) -> None:
+        self._write(
+            "INSERT INTO users (user_id, language) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET language = excluded.language",
+            (user_id, language)
+        )
+
+    # ============ Favorites ============
+
+    def get_favorites(self, user_id: int, media_type: str) -> List[Dict]:
+        rows = self._fetchall(
+            "SELECT item_id, title, poster_path, added_at FROM favorites "
+            "WHERE user_id = ? AND media_type = ? ORDER BY rowid",
+            (user_id, media_type)
+        )
+        return [
+            {"id": item_id, "title": title, "poster_path": poster_path, "added_at": added_at}
+            for item_id, title, poster_path, added_at in rows
+        ]
+
+    def add_favorite(self, user_id: int, media_type: str, item_id: int, title: str, poster_path: Optional[str] = None) -> bool:
+        return self._write(
+            "INSERT OR IGNORE INTO favorites (user_id, media_type, item_id, title, poster_path, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id, media_type, item_id, title, poster_path, datetime.now().isoformat())
+        ) > 0
+
+    def remove_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        return self._write(
+            "DELETE FROM favorites WHERE user_id = ? AND media_type = ? AND item_id = ?",
+            (user_id, media_type, item_id)
+        ) > 0
+
+    def is_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        return self._fetchone(
+            "SELECT 1 FROM favorites WHERE user_id = ? AND media_type = ? AND item_id = ?",
+            (user_id, media_type, item_id)
+        ) is not None
+
+    # ============ Subscriptions ============
+
+    def get_subscriptions(self, user_id: int) -> List[str]:
+        rows = self._fetchall("SELECT topic FROM subscriptions WHERE user_id = ? ORDER BY rowid", (user_id,))
+        return [topic for (topic,) in rows]
+
+    def add_subscription(self, user_id: int, topic: str) -> bool:
+        return self._write(
+            "INSERT OR IGNORE INTO subscriptions (user_id, topic) VALUES (?, ?)",
+            (user_id, topic)
+        ) > 0
+
+    def remove_subscription(self, user_id: int, topic: str) -> bool:
+        return self._write(
+            "DELETE FROM subscriptions WHERE user_id = ? AND topic = ?",
+            (user_id, topic)
+        ) > 0
+
+    def is_subscribed(self, user_id: int, topic: str) -> bool:
+        return self._fetchone(
+            "SELECT 1 FROM subscriptions WHERE user_id = ? AND topic = ?",
+            (user_id, topic)
+        ) is not None
+
+    def get_all_subscribers(self, topic: str) -> List[int]:
+        rows = self._fetchall("SELECT user_id FROM subscriptions WHERE topic = ? ORDER BY user_id", (topic,))
+        return [user_id for (user_id,) in rows]
+
+    def iter_subscribers(self, topic: str, chunk_size: int) -> Iterator[List[int]]:
+        """Yield subscriber ids in ascending chunks using keyset pagination on the topic index"""
+        last_id = -1
+        while True:
+            rows = self._fetchall(
+                "SELECT user_id FROM subscriptions WHERE topic = ? AND user_id > ? ORDER BY user_id LIMIT ?",
+                (topic, last_id, chunk_size)
+            )
+            if not rows:
+                return
+            chunk = [user_id for (user_id,) in rows]
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+            last_id = chunk[-1]
+
+    # ============ Per-update access ============
+
+    def apply(self, user_id: int, changes: List[tuple]) -> None:
+        """Apply a batch of (method, *args) changes for one user in one transaction.
+
+        BEGIN IMMEDIATE takes the write lock up front, so the batch cannot
+        fail halfway because another process started writing first.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for name, *args in changes:
+                    getattr(self, name)(user_id, *args)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ============ Bulk import ============
+
+    def is_empty(self) -> bool:
+        """Whether no user has stored anything yet"""
+        with self._lock:
+            return not any(
+                self._fetchone(f"SELECT 1 FROM {table} LIMIT 1")
+                for table in ("users", "favorites", "subscriptions")
+            )
+
+    def import_users(self, prefs: Dict) -> Dict[str, int]:
+        """Import users from the legacy JSON layout in one transaction.
+
+        Existing rows are kept, so running the import twice is harmless.
+        Returns the number of users, favorites and subscriptions written.
+        """
+        counts = {"users": 0, "favorites": 0, "subscriptions": 0}
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for user_key, user_data in prefs.items():
+                    try:
+                        user_id = int(user_key)
+                    except ValueError:
+                        continue
+
+                    cur.execute(
+                        "INSERT OR IGNORE INTO users (user_id, language) VALUES (?, ?)",
+                        (user_id, user_data.get("language", "en"))
+                    )
+                    counts["users"] += cur.rowcount
+
+                    for media_type, items in user_data.get("favorites", {}).items():
+                        for fav in items:
+                            cur.execute(
+                                "INSERT OR IGNORE INTO favorites "
+                                "(user_id, media_type, item_id, title, poster_path, added_at) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                (user_id, media_type, fav.get("id"), fav.get("title", "Unknown"),
+                                 fav.get("poster_path"), fav.get("added_at") or datetime.now().isoformat())
+                            )
+                            counts["favorites"] += cur.rowcount
+
+                    for topic in user_data.get("subscriptions", []):
+                        cur.execute(
+                            "INSERT OR IGNORE INTO subscriptions (user_id, topic) VALUES (?, ?)",
+                            (user_id, topic)
+                        )
+                        counts["subscriptions"] += cur.rowcount
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return counts
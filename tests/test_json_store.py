@@ -0,0 +1,117 @@
+"""
+JSONStore journal replay, torn-record truncation and compaction
+"""
+
+import json
+import os
+
+import pytest
+
+from storage.json_store import JSONStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "user_prefs.json")
+
+
+def test_journal_is_replayed_over_the_snapshot(path):
+    store = JSONStore(path)
+    store.set_language(1, "fr")
+    store.add_favorite(1, "movies", 10, "Ten")
+    store.add_favorite(1, "movies", 11, "Eleven")
+    store.remove_favorite(1, "movies", 10)
+    store.add_subscription(1, "drama")
+    store.close()
+    # Below the threshold nothing was compacted: everything lives in the journal
+    assert not os.path.exists(path)
+
+    store = JSONStore(path)
+    try:
+        assert store.get_language(1) == "fr"
+        assert [fav["id"] for fav in store.get_favorites(1, "movies")] == [11]
+        assert store.get_subscriptions(1) == ["drama"]
+        assert store.get_all_subscribers("drama") == [1]
+    finally:
+        store.close()
+
+
+def test_torn_last_record_is_dropped_and_truncated(path):
+    store = JSONStore(path)
+    store.set_language(1, "fr")
+    store.close()
+    journal_path = path + ".journal"
+    valid_size = os.path.getsize(journal_path)
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('["lang","1","d')
+
+    store = JSONStore(path)
+    assert store.get_language(1) == "fr"
+    assert os.path.getsize(journal_path) == valid_size
+    # New records start on a clean line instead of extending the torn one
+    store.add_subscription(1, "comedy")
+    store.close()
+
+    store = JSONStore(path)
+    try:
+        assert store.get_language(1) == "fr"
+        assert store.get_subscriptions(1) == ["comedy"]
+    finally:
+        store.close()
+
+
+def test_rotated_journal_of_an_interrupted_compaction_is_kept(path):
+    store = JSONStore(path)
+    store.set_language(1, "fr")
+    store.add_subscription(1, "drama")
+    store.close()
+    # Crash after the journal was rotated aside, before the snapshot was written
+    os.replace(path + ".journal", path + ".journal.1")
+
+    store = JSONStore(path)
+    assert store.get_language(1) == "fr"
+    store.set_language(1, "de")
+    store.close()
+
+    # The rotated journal is replayed first, the current one over it
+    store = JSONStore(path)
+    try:
+        assert store.get_language(1) == "de"
+        assert store.get_subscriptions(1) == ["drama"]
+        assert store.compact()
+        assert not os.path.exists(path + ".journal.1")
+    finally:
+        store.close()
+
+    store = JSONStore(path)
+    try:
+        assert store.get_language(1) == "de"
+        assert store.get_subscriptions(1) == ["drama"]
+    finally:
+        store.close()
+
+
+def test_flush_compacts_past_the_threshold(path):
+    store = JSONStore(path, journal_max_bytes=1)
+    try:
+        for user_id in range(1, 2001):
+            store.add_favorite(user_id, "series", user_id, f"Series {user_id}")
+        store.add_subscription(7, "trending")
+        assert store.flush()
+        assert os.path.getsize(path + ".journal") == 0
+        store.set_language(7, "es")
+    finally:
+        store.close()
+
+    with open(path, encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert len(snapshot) == 2000
+    assert snapshot["7"]["favorites"]["series"][0]["id"] == 7
+    assert snapshot["7"]["subscriptions"] == ["trending"]
+
+    store = JSONStore(path)
+    try:
+        assert store.get_language(7) == "es"
+        assert store.get_all_subscribers("trending") == [7]
+    finally:
+        store.close()
@@ -0,0 +1,117 @@
+"""
+Import of the legacy JSON store into SQLite, by hand and on startup
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from storage.json_store import JSONStore, StoreLockedError
+from storage.migrate import import_json_store
+from storage.sqlite_store import SQLiteStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_legacy_store(path: str, users: int) -> None:
+    """user_prefs.json with `users` users, plus one change still in the journal"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            str(user_id): {
+                "language": "fr",
+                "favorites": {
+                    "movies": [{"id": user_id, "title": f"Movie {user_id}", "poster_path": None, "added_at": "2024-01-01"}],
+                    "series": [],
+                },
+                "subscriptions": ["drama"],
+            }
+            for user_id in range(1, users + 1)
+        }, f)
+    with open(path + ".journal", "w", encoding="utf-8") as f:
+        f.write(json.dumps(["lang", "1", "de"]) + "\n")
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "user_prefs.json"), str(tmp_path / "user_prefs.db")
+
+
+def test_import_includes_the_journal_and_cleans_up(paths):
+    json_path, db_path = paths
+    write_legacy_store(json_path, 3)
+
+    store = SQLiteStore(db_path)
+    try:
+        counts = import_json_store(store, json_path)
+        assert counts == {"users": 3, "favorites": 3, "subscriptions": 3}
+        assert store.get_language(1) == "de"
+        assert store.get_all_subscribers("drama") == [1, 2, 3]
+    finally:
+        store.close()
+
+    # The journal was folded into the snapshot before its files were removed
+    assert not os.path.exists(json_path + ".journal")
+    assert not os.path.exists(json_path + ".lock")
+    with open(json_path, encoding="utf-8") as f:
+        assert json.load(f)["1"]["language"] == "de"
+
+
+def test_only_if_empty_skips_a_filled_database(paths):
+    json_path, db_path = paths
+    write_legacy_store(json_path, 3)
+
+    store = SQLiteStore(db_path)
+    try:
+        store.set_language(99, "es")
+        assert import_json_store(store, json_path, only_if_empty=True) is None
+        assert store.get_language(1) == "en"
+    finally:
+        store.close()
+
+
+def test_import_refuses_a_locked_store(paths):
+    json_path, db_path = paths
+    write_legacy_store(json_path, 3)
+
+    holder = JSONStore(json_path)
+    store = SQLiteStore(db_path)
+    try:
+        with pytest.raises(StoreLockedError):
+            import_json_store(store, json_path, only_if_empty=True)
+        assert store.is_empty()
+        holder.close()
+        assert import_json_store(store, json_path, only_if_empty=True)["users"] == 3
+    finally:
+        store.close()
+
+
+def test_workers_starting_together_import_once(paths):
+    json_path, db_path = paths
+    write_legacy_store(json_path, 5000)
+    env = dict(
+        os.environ,
+        PREFS_BACKEND="sqlite",
+        PREFS_FILE=json_path,
+        PREFS_DB_FILE=db_path,
+        PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+    )
+    code = "import user_prefs; print(user_prefs.get_user_language(1)); user_prefs.close()"
+    workers = [
+        subprocess.Popen([sys.executable, "-c", code], env=env, cwd=ROOT,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(3)
+    ]
+    for worker in workers:
+        out, err = worker.communicate(timeout=60)
+        assert worker.returncode == 0, err
+        assert out.strip() == "de"
+
+    store = SQLiteStore(db_path)
+    try:
+        assert len(store.get_all_subscribers("drama")) == 5000
+    finally:
+        store.close()
+    assert sorted(os.listdir(os.path.dirname(json_path))) == ["user_prefs.db", "user_prefs.json"]
@@ -0,0 +1,88 @@
+"""
+RespClient connection handling against the fake server over TCP
+"""
+
+import socket
+import threading
+
+import pytest
+
+from storage.fake_redis import FakeRedis
+from storage.resp import RespClient
+
+
+class RecordingRedis(FakeRedis):
+    """Fake server that accepts AUTH and SELECT and records them"""
+
+    def __init__(self):
+        super().__init__()
+        self.handshakes = []
+
+    def _cmd_auth(self, *credentials) -> str:
+        self.handshakes.append(("AUTH", *credentials))
+        return "OK"
+
+    def _cmd_select(self, db) -> str:
+        self.handshakes.append(("SELECT", db))
+        return "OK"
+
+
+@pytest.fixture
+def server():
+    """(fake, port, connections): a TCP listener serving each connection with the fake"""
+    fake = RecordingRedis()
+    listener = socket.create_server(("127.0.0.1", 0))
+    connections = []
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            connections.append(conn)
+            threading.Thread(target=fake._serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield fake, listener.getsockname()[1], connections
+    listener.close()
+
+
+def test_url_with_password_and_db(server):
+    fake, port, _ = server
+    client = RespClient(f"redis://:secret@127.0.0.1:{port}/1")
+    try:
+        assert client.execute("PING") == "PONG"
+        assert fake.handshakes == [("AUTH", "secret"), ("SELECT", "1")]
+    finally:
+        client.close()
+
+
+def test_reconnects_after_connection_drop(server):
+    fake, port, connections = server
+    client = RespClient(f"redis://:secret@127.0.0.1:{port}/1")
+    try:
+        client.execute("HSET", "h", "a", "1")
+        connections[0].shutdown(socket.SHUT_RDWR)
+        with pytest.raises(ConnectionError):
+            client.execute("HGET", "h", "a")
+        # The next command opens a new connection and repeats the handshake
+        assert client.execute("HGET", "h", "a") == "1"
+        assert len(connections) == 2
+        assert fake.handshakes[-2:] == [("AUTH", "secret"), ("SELECT", "1")]
+    finally:
+        client.close()
+
+
+def test_timeout_does_not_leak_replies_to_later_commands(server):
+    fake, port, _ = server
+    client = RespClient(f"redis://127.0.0.1:{port}/0", timeout=0.2)
+    release = threading.Event()
+    fake._cmd_slow = lambda: release.wait(2) and "late"
+    try:
+        with pytest.raises(ConnectionError):
+            client.execute("SLOW")
+        release.set()
+        assert client.execute("PING") == "PONG"
+    finally:
+        client.close()
@@ -0,0 +1,49 @@
+"""
+Subscriber iteration and subscription order, the same on every backend
+"""
+
+import pytest
+
+from storage import create_backend
+
+
+@pytest.fixture(params=["json", "sqlite", "kv"])
+def store(request, tmp_path):
+    if request.param == "json":
+        backend = create_backend("json", path=str(tmp_path / "user_prefs.json"))
+    elif request.param == "sqlite":
+        backend = create_backend("sqlite", path=str(tmp_path / "user_prefs.db"))
+    else:
+        backend = create_backend("kv", url="memory://")
+    yield backend
+    backend.close()
+
+
+def test_iter_subscribers_resumes_after_the_last_id(store):
+    for user_id in range(1, 11):
+        store.add_subscription(user_id, "drama")
+
+    chunks = store.iter_subscribers("drama", 3)
+    seen = [next(chunks)]
+    assert seen[0] == [1, 2, 3]
+    # Changes behind and ahead of the cursor while the caller is busy
+    store.remove_subscription(2, "drama")
+    store.remove_subscription(5, "drama")
+    store.add_subscription(0, "drama")
+    store.add_subscription(11, "drama")
+    seen.extend(chunks)
+
+    assert seen == [[1, 2, 3], [4, 6, 7], [8, 9, 10], [11]]
+
+
+def test_iter_subscribers_of_an_empty_topic(store):
+    assert list(store.iter_subscribers("horror", 100)) == []
+
+
+def test_subscriptions_keep_insertion_order(store):
+    for topic in ("trending", "action", "new_movies", "comedy"):
+        assert store.add_subscription(1, topic)
+    assert not store.add_subscription(1, "trending")
+    assert store.remove_subscription(1, "action")
+
+    assert store.get_subscriptions(1) == ["trending", "new_movies", "comedy"]
@@ -0,0 +1,399 @@
+"""
+Response cache for the TMDB client
+Two tiers keyed by endpoint + params + language: a bounded in-memory LRU with
+a TTL per entry, backed by an optional SQLite file that survives restarts.
+Entries found only on disk are promoted back into memory when read.
+Each entry can carry the HTTP validators (ETag / Last-Modified) it was served
+with, so an expired entry can be revalidated instead of downloaded again.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def make_key(endpoint: str, params: Optional[Dict] = None, language: str = "en-US") -> str:
+    """Stable cache key; param order does not matter"""
+    query = "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    return f"{endpoint}?{query}|{language}"
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries expire after their own TTL"""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any, Optional[Dict]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            # Kept until evicted so it can still be served stale when TMDB is down
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, Optional[Dict]]]:
+        """(value, validators) even if expired, or None if never cached or evicted"""
+        entry = self._entries.get(key)
+        return (entry[1], entry[2]) if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: float, validators: Optional[Dict] = None) -> None:
+        """Store a value for `ttl` seconds, evicting the least recently used entries if full"""
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value, validators)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, key: str, ttl: float) -> bool:
+        """Give an existing entry a fresh TTL, e.g. after a 304 Not Modified"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        self._entries[key] = (time.monotonic() + ttl, entry[1], entry[2])
+        self._entries.move_to_end(key)
+        return True
+
+    def expire(self, match: Callable[[str], bool]) -> int:
+        """Mark entries whose key matches as expired, keeping them for revalidation
+        and as a stale fallback; returns how many were expired"""
+        expired = 0
+        for key, (expires_at, value, validators) in self._entries.items():
+            if expires_at > 0 and match(key):
+                self._entries[key] = (0.0, value, validators)
+                expired += 1
+        return expired
+
+    def delete(self, key: str) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    expires_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    validators  TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+"""
+
+
+class DiskCache:
+    """Size-bounded response cache in a SQLite file.
+
+    Expiry uses wall-clock time so entries stay valid across restarts. Expired
+    entries are kept as a stale fallback until the stored JSON exceeds
+    `max_bytes`; then they go first, followed by the least recently read
+    entries, down to 90% of the limit.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(DISK_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "validators" not in columns:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN validators TEXT")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, Optional[Dict]]]:
+        """(value, seconds left, validators) or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, validators FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return json.loads(row[0]), row[1] - now, json.loads(row[2]) if row[2] else None
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, Optional[Dict]]]:
+        """(value, validators) even if expired, or None if missing"""
+        with self._lock:
+            row = self._conn.execute("SELECT value, validators FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1]) if row[1] else None
+
+    def set(self, key: str, value: Any, ttl: float, validators: Optional[Dict] = None) -> None:
+        if ttl <= 0:
+            return
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, expires_at, accessed_at, validators)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data, size, now + ttl, now, json.dumps(validators) if validators else None)
+            )
+            self._size += size - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target: int) -> None:
+        """Drop expired entries, then least recently read ones, until under `target` bytes"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            doomed = []
+            for key, entry_size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if size <= target:
+                    break
+                doomed.append((key,))
+                size -= entry_size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.evictions += len(doomed)
+        self._size = size
+
+    def touch(self, key: str, ttl: float) -> None:
+        """Give an existing entry a fresh TTL without rewriting its value"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?", (now + ttl, now, key)
+            )
+
+    def expire_prefixes(self, prefixes: List[str]) -> int:
+        """Mark entries whose key starts with one of `prefixes` as expired; returns how many"""
+        expired = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for prefix in prefixes:
+                    # Key range scan on the primary key instead of LIKE
+                    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+                    expired += self._conn.execute(
+                        "UPDATE responses SET expires_at = 0 WHERE key >= ? AND key < ? AND expires_at > 0",
+                        (prefix, upper)
+                    ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return expired
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old is None:
+                return False
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= old[0]
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ResponseCache:
+    """Memory tier in front of an optional disk tier.
+
+    Memory holds values as they are; the disk tier stores `encode(value)` and
+    reads back `decode(stored)`, where a decoded None counts as a miss. Values
+    entering memory pass through `share(value, fresh)`, which can swap parts of
+    them for copies other entries already hold. Disk access runs on a dedicated
+    thread so SQLite I/O never blocks the event loop.
+    """
+
+    def __init__(self, memory: TTLCache, disk: Optional[DiskCache] = None,
+                 encode: Callable[[Any], Any] = lambda value: value,
+                 decode: Callable[[Any], Any] = lambda stored: stored,
+                 share: Callable[[Any, bool], Any] = lambda value, fresh: value):
+        self.memory = memory
+        self.disk = disk
+        self.encode = encode
+        self.decode = decode
+        self.share = share
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tmdb-cache") if disk else None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[Any, float, Optional[Dict]]]:
+        found = self.disk.get(key)
+        if found is None:
+            return None
+        value = self.decode(found[0])
+        return (value, found[1], found[2]) if value is not None else None
+
+    def _disk_get_stale(self, key: str) -> Optional[Tuple[Any, Optional[Dict]]]:
+        found = self.disk.get_stale(key)
+        if found is None:
+            return None
+        value = self.decode(found[0])
+        return (value, found[1]) if value is not None else None
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value from memory, else from disk (promoted into memory)"""
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        found = await self._run(self._disk_get, key)
+        if found is None:
+            return None
+        value, ttl, validators = found
+        value = self.share(value, False)
+        self.memory.set(key, value, ttl, validators)
+        return value
+
+    async def get_stale(self, key: str) -> Optional[Tuple[Any, Optional[Dict]]]:
+        """Last known (value, validators), ignoring expiry; used for revalidation
+        and when TMDB cannot be reached"""
+        value = self.memory.get_stale(key)
+        if value is not None or self.disk is None:
+            return value
+        return await self._run(self._disk_get_stale, key)
+
+    async def set(self, key: str, value: Any, ttl: float, validators: Optional[Dict] = None) -> None:
+        """Store a value fresh from the origin in both tiers"""
+        self.memory.set(key, self.share(value, True), ttl, validators)
+        if self.disk is not None:
+            await self._run(self.disk.set, key, self.encode(value), ttl, validators)
+
+    async def touch(self, key: str, value: Any, ttl: float, validators: Optional[Dict] = None) -> None:
+        """Extend an entry confirmed unchanged by TMDB; `value` re-seeds memory if it was evicted"""
+        if not self.memory.touch(key, ttl):
+            self.memory.set(key, self.share(value, False), ttl, validators)
+        if self.disk is not None:
+            await self._run(self.disk.touch, key, ttl)
+
+    async def expire(self, prefixes: List[str]) -> int:
+        """Expire entries whose key starts with one of `prefixes` in both tiers, so the
+        next read revalidates them; returns how many memory entries were expired"""
+        if not prefixes:
+            return 0
+        # One set lookup per distinct prefix length rather than comparing every prefix
+        wanted = frozenset(prefixes)
+        lengths = {len(prefix) for prefix in wanted}
+        expired = self.memory.expire(lambda key: any(key[:n] in wanted for n in lengths))
+        if self.disk is not None:
+            await self._run(self.disk.expire_prefixes, prefixes)
+        return expired
+
+    async def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            await self._run(self.disk.delete, key)
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self._executor.shutdown(wait=True)
+            self.disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        if self.disk is not None:
+            stats["disk"] = self.disk.stats()
+        return stats
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one in-flight task.
+
+    The shared task is shielded, so a caller that gets cancelled does not cancel
+    the request for everyone else waiting on it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def cancel(self) -> None:
+        """Cancel every in-flight task, e.g. before the session is closed"""
+        for task in list(self._inflight.values()):
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "deduplicated": self.deduplicated,
+        }
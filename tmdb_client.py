@@ -2,9 +2,40 @@
 TMDB API Client - Async wrapper for The Movie Database API - Localized
 """
 
+import asyncio
+import re
+from functools import partial
 import aiohttp
-from typing import Optional, Dict, Any
-from config import TMDB_API_KEY, TMDB_BASE_URL, TMDB_IMAGE_BASE
+from datetime import date
+from typing import Optional, Dict, List, Any, AsyncIterator, Awaitable, Callable, Iterable, Tuple
+from config import (
+    TMDB_API_KEY, TMDB_BASE_URL, TMDB_IMAGE_BASE,
+    TMDB_CACHE_MAX_ENTRIES, TMDB_CACHE_LIST_TTL, TMDB_CACHE_DETAILS_TTL, TMDB_CACHE_SEARCH_TTL,
+    TMDB_CACHE_DB_FILE, TMDB_CACHE_DB_MAX_BYTES,
+    TMDB_RATE_LIMIT, TMDB_RATE_BURST, TMDB_429_RETRIES, TMDB_RETRY_AFTER_MAX,
+    TMDB_CONNECT_TIMEOUT, TMDB_READ_TIMEOUT, TMDB_TOTAL_TIMEOUT, TMDB_RETRIES, TMDB_RETRY_BACKOFF,
+    TMDB_BREAKER_THRESHOLD, TMDB_BREAKER_RESET, TMDB_PREFETCH_CONCURRENCY,
+    TMDB_WARM_PAGES, TMDB_WARM_INTERVAL, TMDB_WARM_SPACING, TMDB_BULK_CONCURRENCY, TMDB_CHANGES_INTERVAL,
+    TMDB_FALLBACK_LANGUAGE
+)
+from tmdb_cache import TTLCache, DiskCache, ResponseCache, SingleFlight, make_key
+from tmdb_limits import TokenBucket, CircuitBreaker, backoff_delay, parse_retry_after
+from tmdb_pool import PoolStats, create_connector
+from tmdb_tasks import CacheWarmer, ChangesPoller, Prefetcher, is_prefetching, is_refreshing
+from tmdb_models import Media, MediaDetails, Page, TitleRegistry, Video, encode, decode, failed, fill_missing
+
+# Turns a TMDB JSON payload into the value returned (and cached) by _request
+Parser = Callable[[Dict[str, Any]], Any]
+
+# Details of one title (and its sub-resources such as /videos) change rarely
+DETAILS_ENDPOINT = re.compile(r"^/(movie|tv)/\d+(/|$)")
+# Feeds of recently edited titles, only read by the changes poller
+CHANGES_ENDPOINT = re.compile(r"^/(movie|tv)/changes$")
+
+MOVIES = partial(Page.from_tmdb, media_type="movie")
+SERIES = partial(Page.from_tmdb, media_type="tv")
+MOVIE_DETAILS = partial(MediaDetails.from_tmdb, media_type="movie")
+SERIES_DETAILS = partial(MediaDetails.from_tmdb, media_type="tv")
 
 
 class TMDBClient:
@@ -15,20 +46,101 @@ class TMDBClient:
         self.base_url = TMDB_BASE_URL
         self.image_base = TMDB_IMAGE_BASE
         self.session: Optional[aiohttp.ClientSession] = None
+        self.titles = TitleRegistry()
+        self.cache = ResponseCache(
+            TTLCache(TMDB_CACHE_MAX_ENTRIES),
+            DiskCache(TMDB_CACHE_DB_FILE, TMDB_CACHE_DB_MAX_BYTES) if TMDB_CACHE_DB_FILE else None,
+            encode=encode, decode=decode, share=self.titles.share
+        )
+        self.inflight = SingleFlight()
+        self.limiter = TokenBucket(TMDB_RATE_LIMIT, TMDB_RATE_BURST)
+        self.breaker = CircuitBreaker(TMDB_BREAKER_THRESHOLD, TMDB_BREAKER_RESET)
+        self.stale_served = 0
+        self.revalidated = 0
+        self.pool = PoolStats()
+        self.prefetcher = Prefetcher(TMDB_PREFETCH_CONCURRENCY)
+        self.warmer = CacheWarmer(TMDB_WARM_PAGES, TMDB_WARM_INTERVAL, TMDB_WARM_SPACING)
+        self.changes = ChangesPoller(TMDB_CHANGES_INTERVAL, TMDB_CACHE_DETAILS_TTL)
     
     async def _get_session(self) -> aiohttp.ClientSession:
-        """Get or create aiohttp session"""
+        """Get or create aiohttp session with a pooled, instrumented connector"""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            timeout = aiohttp.ClientTimeout(
+                total=TMDB_TOTAL_TIMEOUT, connect=TMDB_CONNECT_TIMEOUT, sock_read=TMDB_READ_TIMEOUT
+            )
+            self.session = aiohttp.ClientSession(
+                connector=create_connector(), timeout=timeout, trace_configs=[self.pool.trace_config()]
+            )
         return self.session
     
     async def close(self):
-        """Close the session"""
+        """Close the session and the response cache"""
+        self.prefetcher.cancel()
+        self.inflight.cancel()
         if self.session and not self.session.closed:
             await self.session.close()
+        self.cache.close()
+    
+    @staticmethod
+    def _cache_ttl(endpoint: str) -> int:
+        """How long a successful response for this endpoint stays cached"""
+        if endpoint.startswith("/search/"):
+            return TMDB_CACHE_SEARCH_TTL
+        if CHANGES_ENDPOINT.match(endpoint):
+            return 0
+        if DETAILS_ENDPOINT.match(endpoint):
+            return TMDB_CACHE_DETAILS_TTL
+        return TMDB_CACHE_LIST_TTL
+    
+    async def _request(self, endpoint: str, params: Optional[Dict] = None, language: str = "en-US",
+                       parse: Optional[Parser] = None) -> Any:
+        """Make a request to TMDB API, served from cache when possible.
+        The JSON is turned into a model by `parse` (raw dict if None) before caching.
+        Identical concurrent requests share one HTTP call.
+        Cached responses are shared between callers and must not be mutated."""
+        key = make_key(endpoint, params, language)
+        cached = None if is_refreshing() else await self.cache.get(key)
+        if cached is not None:
+            if not is_prefetching():
+                self.prefetcher.record_hit(key)
+            return cached
+        data = await self.inflight.do(key, lambda: self._fetch(key, endpoint, params, language, parse))
+        if is_prefetching() and not failed(data):
+            self.prefetcher.record_fetch(key)
+        return data
     
-    async def _request(self, endpoint: str, params: Optional[Dict] = None, language: str = "en-US") -> Dict[str, Any]:
-        """Make a request to TMDB API"""
+    async def run_cache_warmer(self, languages: List[str]) -> None:
+        """Background task: keep list pages cached in every language (TMDB codes)"""
+        await self.warmer.run(self, languages)
+    
+    async def run_changes_poller(self) -> None:
+        """Background task: expire cached details of titles edited on TMDB"""
+        await self.changes.run(self)
+    
+    async def expire_titles(self, media_type: str, ids: Iterable[int]) -> int:
+        """Expire cached details (every language, videos included) of the given titles,
+        so the next read revalidates them; returns how many memory entries were expired"""
+        return await self.cache.expire([f"/{media_type}/{item_id}{end}" for item_id in ids for end in "?/"])
+    
+    def prefetch(self, call: Callable[..., Awaitable[Any]], *args, **kwargs) -> bool:
+        """Warm the cache for a likely next request, e.g. `prefetch(tmdb.get_popular_movies, page=3)`,
+        without delaying the caller. Skipped while user requests are waiting on the
+        rate limiter or TMDB is failing, so prefetches never compete with them."""
+        busy = self.limiter.waiting > 0 or self.breaker.state != "closed"
+        return self.prefetcher.schedule(call, *args, busy=busy, **kwargs)
+    
+    async def _fetch(self, key: str, endpoint: str, params: Optional[Dict], language: str,
+                     parse: Optional[Parser]) -> Any:
+        """Call TMDB within the rate limit and cache a successful response.
+        A 429 pauses the limiter for Retry-After and the call is retried (then
+        falls back to the last cached response); timeouts, connection errors and
+        5xx are retried with backoff. While TMDB keeps failing the circuit
+        breaker skips it and the last cached response is used.
+        An expired entry is revalidated with its ETag / Last-Modified; on 304 it
+        just gets a fresh TTL."""
+        if not self.breaker.allow():
+            return await self._fallback(key, "TMDB unavailable", parse)
+        
         session = await self._get_session()
         
         url = f"{self.base_url}{endpoint}"
@@ -37,52 +149,160 @@ class TMDBClient:
             "language": language,
             **(params or {})
         }
+        stale = await self.cache.get_stale(key)
+        headers = self._conditional_headers(stale[1] if stale else None)
+        ttl = self._cache_ttl(endpoint)
         
-        async with session.get(url, params=request_params) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                return {"results": [], "error": f"API Error: {response.status}"}
+        throttled = failures = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                async with session.get(url, params=request_params, headers=headers) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        if parse is not None:
+                            data = parse(data)
+                        self.breaker.record_success()
+                        await self.cache.set(key, data, ttl, self._validators(response))
+                        return data
+                    if response.status == 304 and stale is not None:
+                        self.breaker.record_success()
+                        self.revalidated += 1
+                        await self.cache.touch(key, stale[0], ttl, stale[1])
+                        return stale[0]
+                    if response.status == 429 and throttled < TMDB_429_RETRIES:
+                        throttled += 1
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        self.limiter.pause(min(retry_after, TMDB_RETRY_AFTER_MAX))
+                        continue
+                    if response.status == 429:
+                        # Still throttled after the retries; not a verdict on TMDB's health
+                        return await self._fallback(key, "API Error: 429", parse)
+                    if response.status < 500:
+                        # TMDB answered; the request itself was refused
+                        self.breaker.record_success()
+                        return self._error(f"API Error: {response.status}", parse)
+                    error = f"API Error: {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"API Error: {type(e).__name__}"
+            
+            failures += 1
+            if failures > TMDB_RETRIES:
+                self.breaker.record_failure()
+                return await self._fallback(key, error, parse)
+            await asyncio.sleep(backoff_delay(failures, TMDB_RETRY_BACKOFF))
     
-    async def get_now_playing_movies(self, page: int = 1, language: str = "en-US") -> Dict[str, Any]:
+    @staticmethod
+    def _validators(response: aiohttp.ClientResponse) -> Optional[Dict[str, str]]:
+        """ETag / Last-Modified of a response, kept with its cache entry"""
+        validators = {
+            name: response.headers[header]
+            for name, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+            if header in response.headers
+        }
+        return validators or None
+    
+    @staticmethod
+    def _conditional_headers(validators: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers to revalidate a cached response"""
+        headers = {}
+        if validators:
+            if "etag" in validators:
+                headers["If-None-Match"] = validators["etag"]
+            if "last_modified" in validators:
+                headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+    
+    @staticmethod
+    def _error(error: str, parse: Optional[Parser]) -> Any:
+        """Empty result carrying an error message"""
+        data = {"results": [], "error": error}
+        return parse(data) if parse is not None else data
+    
+    async def _fallback(self, key: str, error: str, parse: Optional[Parser]) -> Any:
+        """Last cached response for the key, even if expired, else an empty result"""
+        stale = await self.cache.get_stale(key)
+        if stale is not None:
+            self.stale_served += 1
+            return stale[0]
+        return self._error(error, parse)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Client metrics for the health endpoint"""
+        return {
+            "cache": self.cache.stats(),
+            "titles": self.titles.stats(),
+            "requests": self.inflight.stats(),
+            "rate_limit": self.limiter.stats(),
+            "breaker": self.breaker.stats(),
+            "stale_served": self.stale_served,
+            "revalidated": self.revalidated,
+            "pool": self.pool.stats(),
+            "prefetch": self.prefetcher.stats(),
+            "warmer": self.warmer.stats(),
+            "changes": self.changes.stats(),
+        }
+    
+    async def _with_fallback(self, fetch: Callable[[str], Awaitable[Any]], language: str) -> Any:
+        """`fetch(language)`, with empty localized text filled in from the same request in
+        TMDB_FALLBACK_LANGUAGE. Both run concurrently and are cached separately."""
+        if not TMDB_FALLBACK_LANGUAGE or language == TMDB_FALLBACK_LANGUAGE or is_refreshing():
+            # The cache warmer refreshes every language, the fallback one included, on its own
+            return await fetch(language)
+        localized, fallback = await asyncio.gather(fetch(language), fetch(TMDB_FALLBACK_LANGUAGE))
+        return fill_missing(localized, fallback)
+    
+    async def _list(self, endpoint: str, params: Dict, language: str, parse: Parser) -> Page:
+        return await self._with_fallback(lambda lang: self._request(endpoint, params, language=lang, parse=parse), language)
+    
+    async def get_now_playing_movies(self, page: int = 1, language: str = "en-US") -> Page:
         """Get movies currently in theaters"""
-        return await self._request("/movie/now_playing", {"page": page}, language=language)
+        return await self._list("/movie/now_playing", {"page": page}, language, MOVIES)
     
-    async def get_popular_movies(self, page: int = 1, language: str = "en-US") -> Dict[str, Any]:
+    async def get_popular_movies(self, page: int = 1, language: str = "en-US") -> Page:
         """Get popular movies"""
-        return await self._request("/movie/popular", {"page": page}, language=language)
+        return await self._list("/movie/popular", {"page": page}, language, MOVIES)
     
-    async def get_latest_series(self, page: int = 1, language: str = "en-US") -> Dict[str, Any]:
+    async def get_latest_series(self, page: int = 1, language: str = "en-US") -> Page:
         """Get latest TV series (airing today)"""
-        return await self._request("/tv/airing_today", {"page": page}, language=language)
+        return await self._list("/tv/airing_today", {"page": page}, language, SERIES)
     
-    async def get_popular_series(self, page: int = 1, language: str = "en-US") -> Dict[str, Any]:
+    async def get_popular_series(self, page: int = 1, language: str = "en-US") -> Page:
         """Get popular TV series"""
-        return await self._request("/tv/popular", {"page": page}, language=language)
+        return await self._list("/tv/popular", {"page": page}, language, SERIES)
     
-    async def get_trending(self, media_type: str = "all", time_window: str = "week", page: int = 1, language: str = "en-US") -> Dict[str, Any]:
+    async def get_trending(self, media_type: str = "all", time_window: str = "week", page: int = 1, language: str = "en-US") -> Page:
         """Get trending movies/series"""
-        return await self._request(f"/trending/{media_type}/{time_window}", {"page": page}, language=language)
+        parse = SERIES if media_type == "tv" else MOVIES
+        return await self._list(f"/trending/{media_type}/{time_window}", {"page": page}, language, parse)
     
-    async def search_movies(self, query: str, page: int = 1, language: str = "en-US") -> Dict[str, Any]:
+    async def search_movies(self, query: str, page: int = 1, language: str = "en-US") -> Page:
         """Search for movies"""
-        return await self._request("/search/movie", {"query": query, "page": page}, language=language)
+        return await self._list("/search/movie", {"query": query, "page": page}, language, MOVIES)
     
-    async def search_series(self, query: str, page: int = 1, language: str = "en-US") -> Dict[str, Any]:
+    async def search_series(self, query: str, page: int = 1, language: str = "en-US") -> Page:
         """Search for TV series"""
-        return await self._request("/search/tv", {"query": query, "page": page}, language=language)
+        return await self._list("/search/tv", {"query": query, "page": page}, language, SERIES)
     
-    async def search_multi(self, query: str, page: int = 1, language: str = "en-US") -> Dict[str, Any]:
-        """Search for movies and TV series"""
-        return await self._request("/search/multi", {"query": query, "page": page}, language=language)
+    async def search_multi(self, query: str, page: int = 1, language: str = "en-US") -> Page:
+        """Search for movies and TV series (people are left out)"""
+        return await self._list("/search/multi", {"query": query, "page": page}, language, MOVIES)
     
-    async def get_movie_details(self, movie_id: int, language: str = "en-US") -> Dict[str, Any]:
+    async def get_movie_details(self, movie_id: int, language: str = "en-US") -> MediaDetails:
         """Get movie details"""
-        return await self._request(f"/movie/{movie_id}", language=language)
+        return await self._with_fallback(
+            lambda lang: self._request(f"/movie/{movie_id}", language=lang, parse=MOVIE_DETAILS), language
+        )
     
-    async def get_series_details(self, series_id: int, language: str = "en-US") -> Dict[str, Any]:
+    async def get_series_details(self, series_id: int, language: str = "en-US") -> MediaDetails:
         """Get TV series details"""
-        return await self._request(f"/tv/{series_id}", language=language)
+        return await self._with_fallback(
+            lambda lang: self._request(f"/tv/{series_id}", language=lang, parse=SERIES_DETAILS), language
+        )
+    
+    async def get_changes(self, media_type: str, start_date: date, page: int = 1) -> Dict[str, Any]:
+        """Ids of movies ("movie") or series ("tv") edited since `start_date`"""
+        return await self._request(f"/{media_type}/changes", {"start_date": start_date.isoformat(), "page": page})
     
     async def get_movie_videos(self, movie_id: int, language: str = "en-US") -> Dict[str, Any]:
         """Get movie videos (trailers)"""
@@ -92,59 +312,103 @@ class TMDBClient:
         """Get series videos (trailers)"""
         return await self._request(f"/tv/{series_id}/videos", language=language)
     
+    @staticmethod
+    def _append_params(language: str) -> Dict[str, str]:
+        """Params that append videos in the user's language, English and untagged"""
+        video_languages = dict.fromkeys([language.split("-")[0], "en", "null"])
+        return {
+            "append_to_response": "videos",
+            "include_video_language": ",".join(video_languages),
+        }
+    
+    async def get_movie_full(self, movie_id: int, language: str = "en-US") -> MediaDetails:
+        """Get movie details with videos in one request"""
+        return await self._with_fallback(
+            lambda lang: self._request(f"/movie/{movie_id}", self._append_params(lang), language=lang, parse=MOVIE_DETAILS),
+            language
+        )
+    
+    async def get_series_full(self, series_id: int, language: str = "en-US") -> MediaDetails:
+        """Get TV series details with videos in one request"""
+        return await self._with_fallback(
+            lambda lang: self._request(f"/tv/{series_id}", self._append_params(lang), language=lang, parse=SERIES_DETAILS),
+            language
+        )
+    
+    async def get_many_details(self, ids: Iterable[int], media_type: str = "movie", language: str = "en-US",
+                               concurrency: int = TMDB_BULK_CONCURRENCY) -> AsyncIterator[Tuple[int, MediaDetails]]:
+        """Details of many titles as (id, details), yielded as each one arrives rather than in
+        `ids` order. Fetched like the details views, so cached and in-flight requests are
+        reused; at most `concurrency` requests run at once. Failed titles carry `error`.
+        `media_type` is TMDB's "movie" or "tv" (not the favorites' "movies"/"series")."""
+        if media_type == "movie":
+            fetch = self.get_movie_full
+        elif media_type == "tv":
+            fetch = self.get_series_full
+        else:
+            raise ValueError(f"Unknown media type: {media_type!r} (expected 'movie' or 'tv')")
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def one(item_id: int) -> Tuple[int, MediaDetails]:
+            async with semaphore:
+                return item_id, await fetch(item_id, language=language)
+        
+        tasks = [asyncio.ensure_future(one(item_id)) for item_id in dict.fromkeys(ids)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The caller may stop early; don't leave requests running for it
+            for task in tasks:
+                task.cancel()
+    
+    def find_trailer(self, item: MediaDetails, language: str = "en-US", types: tuple = ("Trailer",)) -> Optional[Video]:
+        """Pick a trailer from details fetched with videos appended,
+        preferring the user's language, then English"""
+        videos = [video for video in item.videos if video.type in types]
+        for wanted in (language.split("-")[0], "en"):
+            for video in videos:
+                if video.language == wanted:
+                    return video
+        return videos[0] if videos else None
+    
     def get_poster_url(self, poster_path: Optional[str]) -> Optional[str]:
         """Get full poster URL"""
         if poster_path:
             return f"{self.image_base}{poster_path}"
         return None
     
-    def format_movie(self, movie: Dict[str, Any], lang: str = "en") -> str:
+    def format_movie(self, movie: Media, lang: str = "en") -> str:
         """Format movie data for display"""
-        title = movie.get("title", "Unknown")
-        rating = movie.get("vote_average", 0)
-        release_date = movie.get("release_date", "N/A")[:10] if movie.get("release_date") else "N/A"
-        overview = movie.get("overview", "No description available.")
-        
-        # Truncate overview if too long
-        if len(overview) > 300:
-            overview = overview[:297] + "..."
+        title = movie.title or "Unknown"
+        release_date = movie.date.isoformat() if movie.date else "N/A"
+        overview = movie.overview or "No description available."
         
         return (
             f"<b>{title}</b>\n"
-            f"⭐ {rating:.1f}/10 | 📅 {release_date}\n"
+            f"⭐ {movie.rating:.1f}/10 | 📅 {release_date}\n"
             f"━━━━━━━━━━━━━━━━━━━━━━━\n"
             f"{overview}"
         )
     
-    def format_series(self, series: Dict[str, Any], lang: str = "en") -> str:
+    def format_series(self, series: Media, lang: str = "en") -> str:
         """Format series data for display"""
-        title = series.get("name", "Unknown")
-        rating = series.get("vote_average", 0)
-        first_air_date = series.get("first_air_date", "N/A")[:10] if series.get("first_air_date") else "N/A"
-        overview = series.get("overview", "No description available.")
-        
-        # Truncate overview if too long
-        if len(overview) > 300:
-            overview = overview[:297] + "..."
+        title = series.title or "Unknown"
+        first_air_date = series.date.isoformat() if series.date else "N/A"
+        overview = series.overview or "No description available."
         
         return (
             f"<b>{title}</b>\n"
-            f"⭐ {rating:.1f}/10 | 📅 {first_air_date}\n"
+            f"⭐ {series.rating:.1f}/10 | 📅 {first_air_date}\n"
             f"━━━━━━━━━━━━━━━━━━━━━━━\n"
             f"{overview}"
         )
     
-    def format_trending_item(self, item: Dict[str, Any], lang: str = "en") -> str:
+    def format_trending_item(self, item: Media, lang: str = "en") -> str:
         """Format trending item (movie or series)"""
-        media_type = item.get("media_type", "movie")
-        
-        if media_type == "movie":
+        if item.is_movie:
             return self.format_movie(item, lang)
-        elif media_type == "tv":
-            return self.format_series(item, lang)
-        else:
-            title = item.get("title") or item.get("name", "Unknown")
-            return f"🔥 <b>{title}</b>"
+        return self.format_series(item, lang)
 
 
 # Global client instance
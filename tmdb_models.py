@@ -0,0 +1,374 @@
+"""
+Compact models for TMDB payloads
+Only the fields the bot renders are kept, in __slots__ classes, with dates
+parsed once and list overviews truncated once, when the response arrives.
+The cache holds these instead of the raw JSON. Language-neutral fields live
+in a Facts object that models of the same title share across languages.
+"""
+
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+from weakref import WeakValueDictionary
+
+# List cards show at most this much of the overview
+OVERVIEW_LIMIT = 300
+
+# Bump when a model's fields change so older disk cache entries are ignored
+MODEL_VERSION = 1
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """TMDB "YYYY-MM-DD" (possibly empty) to a date"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+def truncate(text: str, limit: int = OVERVIEW_LIMIT) -> str:
+    if len(text) > limit:
+        return text[:limit - 3] + "..."
+    return text
+
+
+class Video:
+    """A YouTube trailer or teaser"""
+
+    __slots__ = ("key", "type", "language")
+
+    def __init__(self, key: str, type: str, language: Optional[str]):
+        self.key = key
+        self.type = type
+        self.language = language
+
+    @classmethod
+    def from_tmdb(cls, data: Dict[str, Any]) -> "Video":
+        return cls(data["key"], data.get("type", ""), data.get("iso_639_1"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"key": self.key, "type": self.type, "language": self.language}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Video":
+        return cls(data["key"], data["type"], data["language"])
+
+
+class Facts:
+    """Language-neutral fields of one title, shared by its models in every language"""
+
+    __slots__ = ("id", "media_type", "rating", "date", "poster_path",
+                 "runtime", "seasons", "episodes", "status", "detailed", "__weakref__")
+
+    def __init__(self, id: int, media_type: str, rating: float, date: Optional[date],
+                 poster_path: Optional[str], runtime: int = 0, seasons: int = 0, episodes: int = 0,
+                 status: Optional[str] = None, detailed: bool = False):
+        self.id = id
+        self.media_type = media_type
+        self.rating = rating
+        self.date = date
+        self.poster_path = poster_path
+        self.runtime = runtime
+        self.seasons = seasons
+        self.episodes = episodes
+        self.status = status
+        # Whether the details-only fields (runtime, seasons, ...) are known
+        self.detailed = detailed
+
+    @classmethod
+    def from_tmdb(cls, data: Dict[str, Any], media_type: str, detailed: bool = False) -> "Facts":
+        media_type = data.get("media_type") or media_type
+        is_movie = media_type == "movie"
+        return cls(
+            data.get("id"), media_type, float(data.get("vote_average") or 0),
+            parse_date(data.get("release_date") if is_movie else data.get("first_air_date")),
+            data.get("poster_path"), data.get("runtime") or 0, data.get("number_of_seasons") or 0,
+            data.get("number_of_episodes") or 0, data.get("status"), detailed
+        )
+
+    def merge(self, other: "Facts", fresh: bool) -> None:
+        """Take `other`'s values if they are `fresh` from TMDB, else only fill in missing details"""
+        if fresh:
+            self.rating = other.rating
+            self.date = other.date
+            self.poster_path = other.poster_path
+        if other.detailed and (fresh or not self.detailed):
+            self.runtime = other.runtime
+            self.seasons = other.seasons
+            self.episodes = other.episodes
+            self.status = other.status
+            self.detailed = True
+
+
+class Media:
+    """A movie or series as shown on a list card: shared facts plus localized text"""
+
+    __slots__ = ("facts", "title", "overview")
+
+    def __init__(self, facts: Facts, title: str, overview: str):
+        self.facts = facts
+        self.title = title
+        self.overview = overview
+
+    @property
+    def id(self) -> int:
+        return self.facts.id
+
+    @property
+    def media_type(self) -> str:
+        return self.facts.media_type
+
+    @property
+    def rating(self) -> float:
+        return self.facts.rating
+
+    @property
+    def date(self) -> Optional[date]:
+        return self.facts.date
+
+    @property
+    def poster_path(self) -> Optional[str]:
+        return self.facts.poster_path
+
+    @property
+    def is_movie(self) -> bool:
+        return self.facts.media_type == "movie"
+
+    @staticmethod
+    def _title(data: Dict[str, Any], facts: Facts) -> str:
+        return (data.get("title") if facts.media_type == "movie" else data.get("name")) or ""
+
+    @classmethod
+    def from_tmdb(cls, data: Dict[str, Any], media_type: str = "movie") -> "Media":
+        facts = Facts.from_tmdb(data, media_type)
+        return cls(facts, cls._title(data, facts), truncate(data.get("overview") or ""))
+
+    def filled_from(self, other: "Media") -> "Media":
+        """This title with empty text taken from `other`, the same title in another
+        language; returns self when nothing is missing (cached models are never changed)"""
+        if self.title and self.overview:
+            return self
+        return Media(self.facts, self.title or other.title, self.overview or other.overview)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "media_type": self.media_type,
+            "title": self.title,
+            "overview": self.overview,
+            "rating": self.rating,
+            "date": self.date.isoformat() if self.date else None,
+            "poster_path": self.poster_path,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Media":
+        facts = Facts(data["id"], data["media_type"], data["rating"], parse_date(data["date"]), data["poster_path"])
+        return cls(facts, data["title"], data["overview"])
+
+
+class MediaDetails(Media):
+    """Full details of one title, with its full overview, genre names and trailers"""
+
+    __slots__ = ("genres", "videos", "error")
+
+    def __init__(self, facts: Facts, title: str, overview: str, genres: Tuple[str, ...] = (),
+                 videos: Tuple[Video, ...] = (), error: Optional[str] = None):
+        super().__init__(facts, title, overview)
+        self.genres = genres
+        self.videos = videos
+        self.error = error
+
+    @property
+    def runtime(self) -> int:
+        return self.facts.runtime
+
+    @property
+    def seasons(self) -> int:
+        return self.facts.seasons
+
+    @property
+    def episodes(self) -> int:
+        return self.facts.episodes
+
+    @property
+    def status(self) -> Optional[str]:
+        return self.facts.status
+
+    @classmethod
+    def from_tmdb(cls, data: Dict[str, Any], media_type: str = "movie") -> "MediaDetails":
+        facts = Facts.from_tmdb(data, media_type, detailed="error" not in data)
+        videos = tuple(
+            Video.from_tmdb(video) for video in data.get("videos", {}).get("results", [])
+            if video.get("site") == "YouTube" and video.get("type") in ("Trailer", "Teaser") and video.get("key")
+        )
+        return cls(
+            facts, cls._title(data, facts), data.get("overview") or "",
+            genres=tuple(genre["name"] for genre in data.get("genres", [])),
+            videos=videos,
+            error=data.get("error")
+        )
+
+    def filled_from(self, other: "Media") -> "MediaDetails":
+        if self.title and self.overview and self.genres and self.videos:
+            return self
+        if not isinstance(other, MediaDetails):
+            other = MediaDetails(other.facts, other.title, other.overview)
+        return MediaDetails(
+            self.facts, self.title or other.title, self.overview or other.overview,
+            self.genres or other.genres, self.videos or other.videos, self.error
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **super().to_dict(),
+            "runtime": self.runtime,
+            "genres": list(self.genres),
+            "seasons": self.seasons,
+            "episodes": self.episodes,
+            "status": self.status,
+            "videos": [video.to_dict() for video in self.videos],
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MediaDetails":
+        facts = Facts(
+            data["id"], data["media_type"], data["rating"], parse_date(data["date"]), data["poster_path"],
+            data["runtime"], data["seasons"], data["episodes"], data["status"], detailed=not data["error"]
+        )
+        return cls(
+            facts, data["title"], data["overview"], tuple(data["genres"]),
+            tuple(Video.from_dict(video) for video in data["videos"]), data["error"]
+        )
+
+
+class Page:
+    """One page of a list, search or trending response"""
+
+    __slots__ = ("page", "total_pages", "results", "error")
+
+    def __init__(self, page: int, total_pages: int, results: Tuple[Media, ...], error: Optional[str] = None):
+        self.page = page
+        self.total_pages = total_pages
+        self.results = results
+        self.error = error
+
+    @classmethod
+    def from_tmdb(cls, data: Dict[str, Any], media_type: str = "movie") -> "Page":
+        """Parse a page; people and other non-title results are dropped"""
+        results = tuple(
+            Media.from_tmdb(item, media_type) for item in data.get("results", [])
+            if (item.get("media_type") or media_type) in ("movie", "tv")
+        )
+        return cls(data.get("page", 1), data.get("total_pages", 1), results, data.get("error"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "page": self.page,
+            "total_pages": self.total_pages,
+            "results": [item.to_dict() for item in self.results],
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Page":
+        return cls(
+            data["page"], data["total_pages"],
+            tuple(Media.from_dict(item) for item in data["results"]), data["error"]
+        )
+
+
+MODELS = {model.__name__: model for model in (Page, Media, MediaDetails)}
+
+
+class TitleRegistry:
+    """One Facts instance per title, shared by the cached models of every language.
+
+    Cached pages and details hold only their localized text (title, overview,
+    genre names, trailers) next to a reference to these shared facts, so
+    memory grows with titles plus translations rather than titles times
+    languages. Entries go away once no cached model refers to them.
+    """
+
+    def __init__(self):
+        self._titles: "WeakValueDictionary[Tuple[str, int], Facts]" = WeakValueDictionary()
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def _canonical(self, facts: Facts, fresh: bool) -> Facts:
+        if facts.id is None:
+            return facts
+        key = (facts.media_type, facts.id)
+        known = self._titles.get(key)
+        if known is None:
+            self._titles[key] = facts
+            return facts
+        if known is not facts:
+            known.merge(facts, fresh)
+            self.shared += 1
+        return known
+
+    def share(self, value: Any, fresh: bool = True) -> Any:
+        """Point the models in `value` at the shared facts of their titles.
+
+        `fresh` values come straight from TMDB and update the shared facts;
+        others (e.g. read back from disk) only fill in what is missing.
+        """
+        if isinstance(value, Page):
+            for item in value.results:
+                item.facts = self._canonical(item.facts, fresh)
+        elif isinstance(value, Media):
+            value.facts = self._canonical(value.facts, fresh)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {"titles": len(self._titles), "shared": self.shared}
+
+
+def failed(value: Any) -> bool:
+    """Whether a client result (model or raw dict) carries an error"""
+    if isinstance(value, dict):
+        return "error" in value
+    return bool(getattr(value, "error", None))
+
+
+def fill_missing(value: Any, fallback: Any) -> Any:
+    """`value` with empty localized text filled from `fallback`, the same response in
+    another language. A failed `value` is replaced by a successful `fallback`."""
+    if failed(value):
+        return value if failed(fallback) else fallback
+    if failed(fallback):
+        return value
+    if isinstance(value, Page) and isinstance(fallback, Page):
+        others = {(item.media_type, item.id): item for item in fallback.results}
+        results = tuple(
+            item.filled_from(others[(item.media_type, item.id)]) if (item.media_type, item.id) in others else item
+            for item in value.results
+        )
+        if all(new is old for new, old in zip(results, value.results)):
+            return value
+        return Page(value.page, value.total_pages, results, value.error)
+    if isinstance(value, Media) and isinstance(fallback, Media) and value.id == fallback.id:
+        return value.filled_from(fallback)
+    return value
+
+
+def encode(value: Any) -> Dict[str, Any]:
+    """JSON-ready form of a cached value, tagged with its model"""
+    name = type(value).__name__
+    if name in MODELS:
+        return {"model": name, "version": MODEL_VERSION, "data": value.to_dict()}
+    return {"model": "raw", "version": MODEL_VERSION, "data": value}
+
+
+def decode(stored: Dict[str, Any]) -> Optional[Any]:
+    """Cached value from its encoded form; None for entries from another model version"""
+    if not isinstance(stored, dict) or stored.get("version") != MODEL_VERSION:
+        return None
+    if stored["model"] == "raw":
+        return stored["data"]
+    return MODELS[stored["model"]].from_dict(stored["data"])
@@ -0,0 +1,95 @@
+"""
+Connection pool for the TMDB session
+Builds the TCPConnector from config and counts pool activity through
+aiohttp's request tracing hooks
+"""
+
+from typing import Any, Dict
+
+import aiohttp
+
+from config import TMDB_POOL_LIMIT, TMDB_POOL_LIMIT_PER_HOST, TMDB_DNS_CACHE_TTL, TMDB_KEEPALIVE_TIMEOUT
+
+
+def create_connector() -> aiohttp.TCPConnector:
+    """Pooled connector; must be created inside the running event loop"""
+    return aiohttp.TCPConnector(
+        limit=TMDB_POOL_LIMIT,
+        limit_per_host=TMDB_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=TMDB_DNS_CACHE_TTL,
+        keepalive_timeout=TMDB_KEEPALIVE_TIMEOUT,
+    )
+
+
+class PoolStats:
+    """Connection pool counters fed by an aiohttp TraceConfig"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """TraceConfig to pass to the ClientSession"""
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_end.append(self._on_request_done)
+        trace.on_request_exception.append(self._on_request_done)
+        trace.on_connection_queued_start.append(self._on_queued_start)
+        trace.on_connection_queued_end.append(self._on_queued_end)
+        trace.on_connection_create_end.append(self._on_connection_created)
+        trace.on_connection_reuseconn.append(self._on_connection_reused)
+        trace.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(self._on_dns_cache_miss)
+        return trace
+
+    # ============ Trace callbacks ============
+
+    async def _on_request_start(self, session, ctx, params) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    async def _on_request_done(self, session, ctx, params) -> None:
+        self.in_flight -= 1
+
+    async def _on_queued_start(self, session, ctx, params) -> None:
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+
+    async def _on_queued_end(self, session, ctx, params) -> None:
+        self.waiting -= 1
+
+    async def _on_connection_created(self, session, ctx, params) -> None:
+        self.new_connections += 1
+
+    async def _on_connection_reused(self, session, ctx, params) -> None:
+        self.reused_connections += 1
+
+    async def _on_dns_cache_hit(self, session, ctx, params) -> None:
+        self.dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session, ctx, params) -> None:
+        self.dns_cache_misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        connections = self.new_connections + self.reused_connections
+        return {
+            "limit": TMDB_POOL_LIMIT,
+            "limit_per_host": TMDB_POOL_LIMIT_PER_HOST,
+            # Requests that got past the pool queue each hold a connection
+            "in_use": self.in_flight - self.waiting,
+            "requests_in_flight": self.in_flight,
+            "max_requests_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_rate": round(self.reused_connections / connections, 3) if connections else None,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
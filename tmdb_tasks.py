@@ -0,0 +1,258 @@
+"""
+Background work for the TMDB client
+Prefetching of likely next requests and scheduled refreshes of list pages,
+both feeding the response cache, and expiry of cached details for titles
+that TMDB reports as changed
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from tmdb_models import failed
+
+logger = logging.getLogger(__name__)
+
+# Set inside background tasks so the client can tell them apart from user requests
+_prefetching: ContextVar[bool] = ContextVar("tmdb_prefetching", default=False)
+_refreshing: ContextVar[bool] = ContextVar("tmdb_refreshing", default=False)
+
+
+def is_prefetching() -> bool:
+    """Whether the current request was started by the prefetcher"""
+    return _prefetching.get()
+
+
+def is_refreshing() -> bool:
+    """Whether the current request should skip the cache and replace its entry"""
+    return _refreshing.get()
+
+
+class Prefetcher:
+    """Runs cache-warming calls in the background within a concurrency budget.
+
+    Calls beyond the budget are dropped rather than queued, so prefetching
+    never builds a backlog in front of user requests. Keys it loaded are
+    remembered until a user request reads them, which gives the hit rate.
+    """
+
+    def __init__(self, max_concurrent: int = 4, remember: int = 10000):
+        self.max_concurrent = max_concurrent
+        self.remember = remember
+        self._tasks: Set[asyncio.Task] = set()
+        self._unused: "OrderedDict[str, None]" = OrderedDict()
+        self.scheduled = 0
+        self.skipped = 0
+        self.fetched = 0
+        self.hits = 0
+
+    def schedule(self, call: Callable[..., Awaitable[Any]], *args, busy: bool = False, **kwargs) -> bool:
+        """Start `call(*args, **kwargs)` in the background unless over budget or `busy`"""
+        if busy or len(self._tasks) >= self.max_concurrent:
+            self.skipped += 1
+            return False
+        task = asyncio.create_task(self._run(call, args, kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.scheduled += 1
+        return True
+
+    async def _run(self, call: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict) -> None:
+        _prefetching.set(True)
+        try:
+            await call(*args, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Prefetch failed: {e}")
+
+    def record_fetch(self, key: str) -> None:
+        """A prefetch loaded `key` into the cache"""
+        self.fetched += 1
+        self._unused[key] = None
+        while len(self._unused) > self.remember:
+            self._unused.popitem(last=False)
+
+    def record_hit(self, key: str) -> None:
+        """A user request was served from the cache for `key`"""
+        if key in self._unused:
+            del self._unused[key]
+            self.hits += 1
+
+    def cancel(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": len(self._tasks),
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "fetched": self.fetched,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.fetched, 3) if self.fetched else None,
+        }
+
+
+class CacheWarmer:
+    """Refreshes the first pages of every list in every language before they expire.
+
+    One request every `spacing` seconds, so a full cycle never bursts against
+    the rate limit, and new cycles start every `interval` seconds (keep it below
+    the list TTL). Waits while user requests are queued on the rate limiter.
+    """
+
+    def __init__(self, pages: int = 2, interval: float = 450.0, spacing: float = 0.5):
+        self.pages = pages
+        self.interval = interval
+        self.spacing = spacing
+        self.cycles = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.last_cycle_seconds: Optional[float] = None
+
+    @staticmethod
+    def list_calls(client, page: int, language: str) -> List[Callable[[], Awaitable[Dict]]]:
+        """The list requests users page through, as the handlers make them"""
+        return [
+            lambda: client.get_now_playing_movies(page=page, language=language),
+            lambda: client.get_popular_movies(page=page, language=language),
+            lambda: client.get_latest_series(page=page, language=language),
+            lambda: client.get_popular_series(page=page, language=language),
+            lambda: client.get_trending(media_type="all", time_window="week", page=page, language=language),
+        ]
+
+    async def run(self, client, languages: List[str]) -> None:
+        """Background task: warm list pages for `languages` (TMDB codes) forever"""
+        if self.pages <= 0:
+            return
+        _refreshing.set(True)
+        while True:
+            started = time.monotonic()
+            for page in range(1, self.pages + 1):
+                for language in languages:
+                    for call in self.list_calls(client, page, language):
+                        await self._refresh(client, call)
+            self.cycles += 1
+            self.last_cycle_seconds = round(time.monotonic() - started, 1)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def _refresh(self, client, call: Callable[[], Awaitable[Dict]]) -> None:
+        while client.limiter.waiting > 0:
+            await asyncio.sleep(self.spacing)
+        if client.breaker.state != "closed":
+            # Leave the cached copy alone while TMDB is failing
+            self.skipped += 1
+        else:
+            try:
+                data = await call()
+                if failed(data):
+                    self.failed += 1
+                else:
+                    self.refreshed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Cache warm request failed: {e}")
+        await asyncio.sleep(self.spacing)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pages": self.pages,
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "last_cycle_seconds": self.last_cycle_seconds,
+        }
+
+
+class ChangesPoller:
+    """Expires cached details of titles listed in TMDB's /movie/changes and /tv/changes.
+
+    Every `interval` seconds it reads the feeds since the last successful poll
+    (the first poll covers `lookback` seconds, e.g. the details TTL, capped at
+    the 14 days TMDB allows) and expires matching entries in every language.
+    They stay cached as a stale fallback and the next read revalidates them,
+    which costs a 304 when the part the bot shows did not change.
+
+    The feeds have day granularity, so the current day is read again on every
+    poll; ids already expired for that day are skipped until the date rolls over.
+    """
+
+    def __init__(self, interval: float = 300.0, lookback: float = 86400.0):
+        self.interval = interval
+        self.lookback = lookback
+        self.polls = 0
+        self.changed = 0
+        self.expired = 0
+        self.failed = 0
+        self.since: Optional[date] = None
+        # Ids already expired today, per media type
+        self._seen: Dict[str, Set[int]] = {"movie": set(), "tv": set()}
+        self._seen_day: Optional[date] = None
+
+    async def run(self, client) -> None:
+        """Background task: poll the changes feeds forever"""
+        if self.interval <= 0:
+            return
+        # The feeds are always read from TMDB, never from the cache
+        _refreshing.set(True)
+        today = datetime.now(timezone.utc).date()
+        self.since = today - timedelta(days=min(14, max(1, int(self.lookback // 86400))))
+        while True:
+            started = datetime.now(timezone.utc).date()
+            if started != self._seen_day:
+                self._seen_day = started
+                for seen in self._seen.values():
+                    seen.clear()
+            complete = True
+            for media_type in ("movie", "tv"):
+                ids = await self._changed_ids(client, media_type)
+                if ids is None:
+                    complete = False
+                    continue
+                seen = self._seen[media_type]
+                new_ids = ids - seen
+                if new_ids:
+                    self.changed += len(new_ids)
+                    self.expired += await client.expire_titles(media_type, new_ids)
+                    seen |= new_ids
+            self.polls += 1
+            if complete:
+                # Day granularity: the same day is read again until it is over
+                self.since = started
+            await asyncio.sleep(self.interval)
+
+    async def _changed_ids(self, client, media_type: str) -> Optional[Set[int]]:
+        """Ids changed since `self.since`, or None if a page could not be read"""
+        ids: Set[int] = set()
+        page = 1
+        while True:
+            while client.limiter.waiting > 0:
+                await asyncio.sleep(1)
+            data = await client.get_changes(media_type, self.since, page=page)
+            if failed(data):
+                self.failed += 1
+                logger.warning(f"TMDB {media_type} changes poll failed: {data.get('error')}")
+                return None
+            ids.update(item["id"] for item in data.get("results", []) if item.get("id") is not None)
+            if page >= data.get("total_pages", 1):
+                return ids
+            page += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "polls": self.polls,
+            "since": self.since.isoformat() if self.since else None,
+            "changed_titles": self.changed,
+            "seen_today": sum(len(seen) for seen in self._seen.values()),
+            "expired_entries": self.expired,
+            "failed": self.failed,
+        }
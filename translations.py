@@ -93,6 +93,8 @@ Use the buttons below to get started! 👇
         "fav_removed": "Removed from favorites",
         "fav_already": "Already in favorites",
         "fav_remove_btn": "Remove",
+        "fav_add_btn": "Add to favorites",
+        "fav_saved": "Already saved",
         # Subscriptions
         "subscriptions": "Subscriptions",
         "sub_description": "Subscribe to topics and get notified about new content!",
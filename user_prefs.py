@@ -1,139 +1,151 @@
 """
 User preferences storage - Extended with Favorites and Subscriptions
-Stores user language preferences, favorites, and subscriptions in a JSON file
+Stores user language preferences, favorites, and subscriptions.
+
+The actual storage is chosen with PREFS_BACKEND in config.py: a SQLite
+database (default), the legacy user_prefs.json file, or a Redis-protocol
+key-value server. On the first start with an empty SQLite database, an
+existing user_prefs.json (and its journal) is imported automatically;
+`python -m storage.migrate` does the same by hand.
 """
 
-import json
-import os
-from typing import Dict, List, Optional
-from datetime import datetime
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from config import (
+    PREFS_BACKEND, PREFS_FILE, PREFS_DB_FILE, PREFS_DB_BUSY_TIMEOUT_MS,
+    PREFS_FLUSH_INTERVAL, PREFS_JOURNAL_MAX_BYTES, PREFS_REDIS_URL, PREFS_REDIS_PREFIX
+)
+from storage import PrefsBackend, create_backend
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts while another worker imports user_prefs.json
+LEGACY_IMPORT_RETRY = 0.5
 
-# File path for storing user preferences
-PREFS_FILE = os.path.join(os.path.dirname(__file__), "user_prefs.json")
 
+def _import_legacy_json(store: PrefsBackend) -> None:
+    """Bring over user_prefs.json on the first start with an empty SQLite database,
+    so upgrading to the SQLite default keeps every user's settings.
 
-def _load_prefs() -> Dict:
-    """Load preferences from file"""
-    if os.path.exists(PREFS_FILE):
+    Workers starting together take turns on the JSON store's lock; the ones
+    that get it after the import find the database filled and skip it."""
+    from storage.json_store import StoreLockedError
+    from storage.migrate import import_json_store, json_store_exists
+
+    if not json_store_exists(PREFS_FILE) or not store.is_empty():
+        return
+    logger.info("Empty preferences database, importing %s", PREFS_FILE)
+    waiting = False
+    while True:
         try:
-            with open(PREFS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            counts = import_json_store(store, PREFS_FILE, only_if_empty=True)
+            break
+        except StoreLockedError:
+            if not waiting:
+                logger.info("%s is locked by another process, waiting for its import", PREFS_FILE)
+                waiting = True
+            time.sleep(LEGACY_IMPORT_RETRY)
         except Exception:
-            return {}
-    return {}
+            logger.error(
+                "Could not import %s into %s; stop every bot process and run `python -m storage.migrate`",
+                PREFS_FILE, PREFS_DB_FILE
+            )
+            store.close()
+            raise
+    if counts is None:
+        logger.info("%s was already imported by another worker", PREFS_FILE)
+        return
+    logger.info(
+        "Imported %d users, %d favorites and %d subscriptions from %s",
+        counts["users"], counts["favorites"], counts["subscriptions"], PREFS_FILE
+    )
+
+
+def _create_store() -> PrefsBackend:
+    """Create the configured storage backend"""
+    if PREFS_BACKEND == "json":
+        return create_backend("json", path=PREFS_FILE, journal_max_bytes=PREFS_JOURNAL_MAX_BYTES)
+    if PREFS_BACKEND == "sqlite":
+        store = create_backend("sqlite", path=PREFS_DB_FILE, busy_timeout_ms=PREFS_DB_BUSY_TIMEOUT_MS)
+        _import_legacy_json(store)
+        return store
+    if PREFS_BACKEND == "kv":
+        return create_backend("kv", url=PREFS_REDIS_URL, prefix=PREFS_REDIS_PREFIX)
+    raise ValueError(f"Unknown PREFS_BACKEND: {PREFS_BACKEND}")
+
+
+_store = _create_store()
+
+
+# ============ Persistence ============
+
+def flush() -> bool:
+    """Sync pending changes to disk, compacting the journal if it grew too large.
+    Returns True if a new snapshot was written."""
+    return _store.flush()
+
+
+def sync() -> bool:
+    """Sync pending changes to disk. Returns True if compact() is due."""
+    return _store.sync()
+
 
+def compact() -> bool:
+    """Fold the journal into a new snapshot. Returns True if one was written."""
+    return _store.compact()
 
-def _save_prefs(prefs: Dict) -> None:
-    """Save preferences to file"""
-    try:
-        with open(PREFS_FILE, "w", encoding="utf-8") as f:
-            json.dump(prefs, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
 
+def close() -> None:
+    """Sync and release the underlying storage"""
+    _store.close()
 
-def _get_user_data(user_id: int) -> Dict:
-    """Get user data, creating if not exists"""
-    prefs = _load_prefs()
-    user_key = str(user_id)
-    if user_key not in prefs:
-        prefs[user_key] = {
-            "language": "en",
-            "favorites": {"movies": [], "series": []},
-            "subscriptions": []
-        }
-        _save_prefs(prefs)
-    return prefs[user_key]
+
+async def run_flusher(interval: float = PREFS_FLUSH_INTERVAL) -> None:
+    """Background task: sync and compact storage every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await prefs.flush()
+        except Exception:
+            logger.exception("Background preferences flush failed")
 
 
 # ============ Language Functions ============
 
 def get_user_language(user_id: int) -> str:
     """Get user's preferred language (default: en)"""
-    return _get_user_data(user_id).get("language", "en")
+    return _store.get_language(user_id)
 
 
 def set_user_language(user_id: int, language: str) -> None:
     """Set user's preferred language"""
-    prefs = _load_prefs()
-    user_key = str(user_id)
-    if user_key not in prefs:
-        prefs[user_key] = {"language": "en", "favorites": {"movies": [], "series": []}, "subscriptions": []}
-    prefs[user_key]["language"] = language
-    _save_prefs(prefs)
+    _store.set_language(user_id, language)
 
 
 # ============ Favorites Functions ============
 
 def get_favorites(user_id: int, media_type: str = "movies") -> List[Dict]:
     """Get user's favorite movies or series"""
-    user_data = _get_user_data(user_id)
-    favorites = user_data.get("favorites", {"movies": [], "series": []})
-    return favorites.get(media_type, [])
+    return _store.get_favorites(user_id, media_type)
 
 
 def add_favorite(user_id: int, media_type: str, item_id: int, title: str, poster_path: Optional[str] = None) -> bool:
     """Add item to favorites. Returns True if added, False if already exists."""
-    prefs = _load_prefs()
-    user_key = str(user_id)
-    
-    if user_key not in prefs:
-        prefs[user_key] = {"language": "en", "favorites": {"movies": [], "series": []}, "subscriptions": []}
-    
-    if "favorites" not in prefs[user_key]:
-        prefs[user_key]["favorites"] = {"movies": [], "series": []}
-    
-    if media_type not in prefs[user_key]["favorites"]:
-        prefs[user_key]["favorites"][media_type] = []
-    
-    # Check if already in favorites
-    for fav in prefs[user_key]["favorites"][media_type]:
-        if fav.get("id") == item_id:
-            return False
-    
-    # Add to favorites
-    prefs[user_key]["favorites"][media_type].append({
-        "id": item_id,
-        "title": title,
-        "poster_path": poster_path,
-        "added_at": datetime.now().isoformat()
-    })
-    
-    _save_prefs(prefs)
-    return True
+    return _store.add_favorite(user_id, media_type, item_id, title, poster_path)
 
 
 def remove_favorite(user_id: int, media_type: str, item_id: int) -> bool:
     """Remove item from favorites. Returns True if removed, False if not found."""
-    prefs = _load_prefs()
-    user_key = str(user_id)
-    
-    if user_key not in prefs:
-        return False
-    
-    if "favorites" not in prefs[user_key]:
-        return False
-    
-    if media_type not in prefs[user_key]["favorites"]:
-        return False
-    
-    # Find and remove
-    for i, fav in enumerate(prefs[user_key]["favorites"][media_type]):
-        if fav.get("id") == item_id:
-            prefs[user_key]["favorites"][media_type].pop(i)
-            _save_prefs(prefs)
-            return True
-    
-    return False
+    return _store.remove_favorite(user_id, media_type, item_id)
 
 
 def is_favorite(user_id: int, media_type: str, item_id: int) -> bool:
     """Check if item is in favorites"""
-    favorites = get_favorites(user_id, media_type)
-    for fav in favorites:
-        if fav.get("id") == item_id:
-            return True
-    return False
+    return _store.is_favorite(user_id, media_type, item_id)
 
 
 # ============ Subscription Functions ============
@@ -155,67 +167,130 @@ SUBSCRIPTION_TOPICS = {
 
 def get_subscriptions(user_id: int) -> List[str]:
     """Get user's subscription topics"""
-    user_data = _get_user_data(user_id)
-    return user_data.get("subscriptions", [])
+    return _store.get_subscriptions(user_id)
 
 
 def add_subscription(user_id: int, topic: str) -> bool:
     """Subscribe to a topic. Returns True if subscribed, False if already subscribed."""
     if topic not in SUBSCRIPTION_TOPICS:
         return False
-    
-    prefs = _load_prefs()
-    user_key = str(user_id)
-    
-    if user_key not in prefs:
-        prefs[user_key] = {"language": "en", "favorites": {"movies": [], "series": []}, "subscriptions": []}
-    
-    if "subscriptions" not in prefs[user_key]:
-        prefs[user_key]["subscriptions"] = []
-    
-    if topic in prefs[user_key]["subscriptions"]:
-        return False
-    
-    prefs[user_key]["subscriptions"].append(topic)
-    _save_prefs(prefs)
-    return True
+    return _store.add_subscription(user_id, topic)
 
 
 def remove_subscription(user_id: int, topic: str) -> bool:
     """Unsubscribe from a topic. Returns True if unsubscribed, False if not found."""
-    prefs = _load_prefs()
-    user_key = str(user_id)
-    
-    if user_key not in prefs:
-        return False
-    
-    if "subscriptions" not in prefs[user_key]:
-        return False
-    
-    if topic not in prefs[user_key]["subscriptions"]:
-        return False
-    
-    prefs[user_key]["subscriptions"].remove(topic)
-    _save_prefs(prefs)
-    return True
+    return _store.remove_subscription(user_id, topic)
 
 
 def is_subscribed(user_id: int, topic: str) -> bool:
     """Check if user is subscribed to a topic"""
-    subscriptions = get_subscriptions(user_id)
-    return topic in subscriptions
+    return _store.is_subscribed(user_id, topic)
 
 
 def get_all_subscribers(topic: str) -> List[int]:
     """Get all user IDs subscribed to a topic"""
-    prefs = _load_prefs()
-    subscribers = []
-    
-    for user_key, user_data in prefs.items():
-        if topic in user_data.get("subscriptions", []):
-            try:
-                subscribers.append(int(user_key))
-            except ValueError:
-                pass
-    
-    return subscribers
+    return _store.get_all_subscribers(topic)
+
+
+def iter_subscribers(topic: str, chunk_size: int = 1000) -> Iterator[List[int]]:
+    """Stream user IDs subscribed to a topic in chunks of at most `chunk_size`.
+
+    Lets notification fan-out walk large audiences without building the full list.
+    """
+    return _store.iter_subscribers(topic, chunk_size)
+
+
+# ============ Per-update Functions ============
+
+# Store methods that may appear in a batch passed to apply_changes
+BATCH_METHODS = {
+    "set_language", "add_favorite", "remove_favorite", "add_subscription", "remove_subscription"
+}
+
+
+def apply_changes(user_id: int, changes: List[tuple]) -> None:
+    """Apply a batch of (method, *args) changes for one user at once"""
+    for name, *_ in changes:
+        if name not in BATCH_METHODS:
+            raise ValueError(f"Unsupported preference change: {name}")
+    _store.apply(user_id, changes)
+
+
+# ============ Async API ============
+
+class AsyncPrefs:
+    """Awaitable preferences API for handlers.
+
+    Every call runs on a dedicated storage thread, so disk I/O and JSON
+    serialization never block the event loop. One worker keeps calls in
+    submission order. Compaction runs on a thread of its own, so calls
+    queued behind a flush do not wait for a snapshot to be written.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefs")
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefs-compact")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def close(self) -> None:
+        """Wait for queued calls, stop the storage threads and close the store"""
+        self._compactor.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+        close()
+
+    async def flush(self) -> bool:
+        if not await self._run(sync):
+            return False
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._compactor, compact)
+
+    async def get_language(self, user_id: int) -> str:
+        return await self._run(get_user_language, user_id)
+
+    async def set_language(self, user_id: int, language: str) -> None:
+        await self._run(set_user_language, user_id, language)
+
+    async def get_favorites(self, user_id: int, media_type: str = "movies") -> List[Dict]:
+        return await self._run(get_favorites, user_id, media_type)
+
+    async def add_favorite(self, user_id: int, media_type: str, item_id: int, title: str, poster_path: Optional[str] = None) -> bool:
+        return await self._run(add_favorite, user_id, media_type, item_id, title, poster_path)
+
+    async def remove_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        return await self._run(remove_favorite, user_id, media_type, item_id)
+
+    async def is_favorite(self, user_id: int, media_type: str, item_id: int) -> bool:
+        return await self._run(is_favorite, user_id, media_type, item_id)
+
+    async def get_subscriptions(self, user_id: int) -> List[str]:
+        return await self._run(get_subscriptions, user_id)
+
+    async def add_subscription(self, user_id: int, topic: str) -> bool:
+        return await self._run(add_subscription, user_id, topic)
+
+    async def remove_subscription(self, user_id: int, topic: str) -> bool:
+        return await self._run(remove_subscription, user_id, topic)
+
+    async def is_subscribed(self, user_id: int, topic: str) -> bool:
+        return await self._run(is_subscribed, user_id, topic)
+
+    async def apply_changes(self, user_id: int, changes: List[tuple]) -> None:
+        await self._run(apply_changes, user_id, changes)
+
+    async def get_all_subscribers(self, topic: str) -> List[int]:
+        return await self._run(get_all_subscribers, topic)
+
+    async def iter_subscribers(self, topic: str, chunk_size: int = 1000) -> AsyncIterator[List[int]]:
+        chunks = iter_subscribers(topic, chunk_size)
+        while True:
+            chunk = await self._run(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+# Global async API instance
+prefs = AsyncPrefs()